@@ -1,18 +1,19 @@
 """Main plugin entry point for Unified Video Browser"""
+import time
+STARTED = time.perf_counter()
+
 import sys
 import os
+from typing import List, Optional, Tuple
 from urllib.parse import parse_qs
 import xbmc
 import xbmcaddon
 import xbmcgui
 import xbmcplugin
 
-# Import library modules
-from resources.lib.kodi_database import KodiDatabase
-from resources.lib.nfo_parser import NFOParser
+# Import library modules, heavier ones are imported by the component factories
+from resources.lib.components import ComponentRegistry
 from resources.lib.movie_model import Movie, MovieCollection
-from resources.lib.image_processor import ImageProcessor
-from resources.lib.state_manager import StateManager
 
 # Get addon information
 addon = xbmcaddon.Addon()
@@ -28,71 +29,166 @@ def log(msg, level=xbmc.LOGINFO):
 class UnifiedBrowserPlugin:
     """Main plugin class"""
     
+    # Movies per list page when the setting is missing
+    DEFAULT_PAGE_SIZE = 100
+    
+    # Pages after the shown one whose thumbnails are made in the background
+    WARMUP_PAGES = 2
+    
     def __init__(self):
         self.addon = addon
         self.handle = addon_handle
         self.url = addon_url
         
-        # Initialize components
-        self.db = KodiDatabase()
-        self.nfo_parser = NFOParser()
-        self.state_manager = StateManager()
-        
-        # Get settings
-        cache_path = self.addon.getSetting('cache_path')
-        self.image_processor = ImageProcessor(cache_path)
+        self.action = ''
         
-        # Load state
-        self.state = self.state_manager.load_state()
+        # Components are created when an action first uses them
+        self.components = ComponentRegistry()
+        for name in ('db', 'movie_cache', 'folder_art', 'nfo_parser',
+                     'state_manager', 'state', 'image_processor'):
+            self.components.register(name, getattr(self, f'_create_{name}'))
         
         # Movie collection
         self.movies = MovieCollection()
         self.filtered_movies = []
     
+    def _create_db(self):
+        """Create the Kodi database connector with the search index"""
+        from resources.lib.kodi_database import KodiDatabase
+        from resources.lib.search_index import SearchIndex
+        return KodiDatabase(SearchIndex(self.addon.getAddonInfo('profile')))
+    
+    def _create_movie_cache(self):
+        """Create the movie list cache"""
+        from resources.lib.movie_cache import MovieCache
+        return MovieCache(self.addon.getAddonInfo('profile'), self.db.db_path)
+    
+    def _create_folder_art(self):
+        """Create the folder.jpg resolver"""
+        from resources.lib.folder_art import FolderArtResolver
+        return FolderArtResolver(self.addon.getAddonInfo('profile'))
+    
+    def _create_nfo_parser(self):
+        """Create the NFO parser"""
+        from resources.lib.nfo_parser import NFOParser
+        return NFOParser()
+    
+    def _create_state_manager(self):
+        """Create the state manager"""
+        from resources.lib.state_manager import StateManager
+        return StateManager()
+    
+    def _create_state(self):
+        """Load the saved plugin state"""
+        return self.state_manager.load_state()
+    
+    def _create_image_processor(self):
+        """Create the image processor with the thumbnail settings"""
+        from resources.lib.image_processor import ImageProcessor
+        return ImageProcessor(
+            self.addon.getSetting('cache_path'),
+            self.get_int_setting('default_thumb_size', 200),
+            self.get_int_setting('cache_size', 100)
+        )
+    
+    @property
+    def db(self):
+        """Kodi database connector"""
+        return self.components.get('db')
+    
+    @property
+    def movie_cache(self):
+        """Persistent cache of the filtered movie list"""
+        return self.components.get('movie_cache')
+    
+    @property
+    def folder_art(self):
+        """Bulk folder.jpg resolver"""
+        return self.components.get('folder_art')
+    
+    @property
+    def nfo_parser(self):
+        """NFO file parser"""
+        return self.components.get('nfo_parser')
+    
+    @property
+    def state_manager(self):
+        """Plugin state persistence"""
+        return self.components.get('state_manager')
+    
+    @property
+    def state(self) -> dict:
+        """Plugin state, loaded on first use"""
+        return self.components.get('state')
+    
+    @property
+    def image_processor(self):
+        """Thumbnail compositing and cache"""
+        return self.components.get('image_processor')
+    
+    def finish(self):
+        """Finish thumbnails of the shown page, the listing is already shown"""
+        if self.components.is_created('image_processor'):
+            self.image_processor.wait()
+    
+    def report_startup(self, ready: float):
+        """Log how long the action took until its result was handed to Kodi
+        
+        Args:
+            ready: perf_counter() value when the action returned
+        """
+        level = xbmc.LOGINFO if self.addon.getSetting('debug_logging') == 'true' else xbmc.LOGDEBUG
+        log(f'Action {self.action or "default"} ready in {(ready - STARTED) * 1000:.1f} ms, '
+            f'components: {self.components.format_timings()}', level)
+    
     def load_movies(self):
-        """Load movies from database"""
+        """Load movies from the movie cache or the database"""
         try:
-            log('Loading movies from database...')
-            
             # Get filters from state
             filters = self.state.get('filters', {})
             
-            # Query database
-            movie_data_list = self.db.get_movies(
-                year_from=filters.get('year_from'),
-                year_to=filters.get('year_to'),
-                include_genres=filters.get('include_genres'),
-                exclude_genres=filters.get('exclude_genres'),
-                include_tags=filters.get('include_tags'),
-                exclude_tags=filters.get('exclude_tags')
-            )
+            # Records cached by an earlier call with the same filters
+            movie_data_list = self.movie_cache.get(filters)
+            from_cache = movie_data_list is not None
             
-            # Create movie objects
+            if not from_cache:
+                log('Loading movies from database...')
+                # Query database, all filters are applied by SQLite
+                movie_data_list = self.db.get_movies(filters)
+            
+            # Create movie objects, folder.jpg is resolved per shown page, video files come with the movie rows
             self.movies = MovieCollection()
             for movie_data in movie_data_list:
-                movie = Movie(movie_data)
-                
-                # Get video files for this movie path
-                if movie.path:
-                    video_files = self.db.get_video_files_for_path(movie.path)
-                    movie.video_files = video_files
-                
-                self.movies.add_movie(movie)
+                self.movies.add_movie(Movie(movie_data))
+            self.filtered_movies = list(self.movies.movies)
             
-            # Apply word filters
-            include_words = filters.get('include_words', '')
-            exclude_words = filters.get('exclude_words', '')
-            self.filtered_movies = self.movies.filter_movies(
-                include_words=include_words,
-                exclude_words=exclude_words
-            )
+            if not from_cache:
+                self.movie_cache.put(filters, [movie.to_dict() for movie in self.filtered_movies])
             
-            log(f'Loaded {len(self.filtered_movies)} movies')
+            log(f'Loaded {len(self.filtered_movies)} movies{" from cache" if from_cache else ""}')
             
         except Exception as e:
             log(f'Error loading movies: {e}', xbmc.LOGERROR)
             self.filtered_movies = []
     
+    def resolve_art(self, movies: List[Movie]) -> bool:
+        """Resolve folder.jpg of movies about to be shown
+        
+        Returns:
+            True if the folder.jpg of a movie was new or changed
+        """
+        records = [{'path': movie.path, 'art_url': movie.art_url} for movie in movies]
+        if not records:
+            return False
+        self.folder_art.resolve(records)
+        changed = False
+        for movie, record in zip(movies, records):
+            if not movie.art_resolved or movie.folder_jpg != record['folder_jpg']:
+                movie.folder_jpg = record['folder_jpg']
+                movie.art_resolved = True
+                changed = True
+        return changed
+    
     def show_filters_view(self):
         """Show filters view (View 1)"""
         log('Showing filters view')
@@ -132,9 +228,66 @@ class UnifiedBrowserPlugin:
         
         xbmcplugin.endOfDirectory(self.handle)
     
-    def show_movie_list_view(self):
-        """Show movie list view (View 2)"""
-        log('Showing movie list view')
+    def get_int_setting(self, setting_id: str, default: int) -> int:
+        """Get a positive integer setting, or the default if it is missing or invalid"""
+        try:
+            return max(1, int(self.addon.getSetting(setting_id) or default))
+        except ValueError:
+            return default
+    
+    def create_movie_item(self, movie: Movie) -> Tuple[str, xbmcgui.ListItem, bool]:
+        """Create the list item of a movie
+        
+        Returns:
+            Tuple of (url, list item, is folder) for addDirectoryItems
+        """
+        list_item = xbmcgui.ListItem(label=movie.get_display_title())
+        
+        # Set info
+        info = {
+            'title': movie.get_display_title(),
+            'plot': movie.plot,
+            'year': movie.year,
+            'duration': movie.runtime * 60 if movie.runtime else 0
+        }
+        list_item.setInfo('video', info)
+        
+        # Set artwork
+        if movie.folder_jpg:
+            # Composite image if cached, folder.jpg until it is made
+            composite_img = self.image_processor.get_composite_image(
+                movie.folder_jpg,
+                movie.get_video_file_count()
+            )
+            if composite_img:
+                list_item.setArt({'thumb': composite_img, 'poster': composite_img})
+        
+        # Determine action based on file count
+        if movie.get_video_file_count() == 1 and movie.video_files:
+            # Single file - play directly
+            video_file = os.path.join(movie.path, movie.video_files[0])
+            url = video_file
+            is_folder = False
+            list_item.setProperty('IsPlayable', 'true')
+        elif movie.get_video_file_count() > 1:
+            # Multiple files - show file list
+            url = f'{self.url}?action=show_files&movie_id={movie.id}'
+            is_folder = True
+        else:
+            # No files - just show details
+            url = f'{self.url}?action=show_details&movie_id={movie.id}'
+            is_folder = False
+        
+        return url, list_item, is_folder
+    
+    def show_movie_list_view(self, page: int = 0):
+        """Show movie list view (View 2)
+        
+        Only the movies of one page are rendered. Pages are slices of the
+        filtered list, which comes from the movie cache after the first
+        call, so moving between pages doesn't query the database.
+        """
+        log(f'Showing movie list view, page {page + 1}')
         
         # Load movies if not loaded
         if not self.filtered_movies:
@@ -142,73 +295,84 @@ class UnifiedBrowserPlugin:
         
         xbmcplugin.setContent(self.handle, 'movies')
         
+        total = len(self.filtered_movies)
+        page_size = self.get_int_setting('page_size', self.DEFAULT_PAGE_SIZE)
+        page_count = max(1, (total + page_size - 1) // page_size)
+        page = min(max(page, 0), page_count - 1)
+        start = page * page_size
+        page_movies = self.filtered_movies[start:start + page_size]
+        
+        # Checked on every visit, folders that didn't change cost a stat call
+        art_changed = self.resolve_art(page_movies)
+        
+        items = []
+        
         # Add navigation to filters
         list_item = xbmcgui.ListItem(label='← Edit Filters')
         url = f'{self.url}?action=show_filters'
-        xbmcplugin.addDirectoryItem(self.handle, url, list_item, isFolder=False)
+        items.append((url, list_item, False))
         
         # Show movie count
-        count_label = f"Movies: {len(self.filtered_movies)}"
+        count_label = f"Movies: {total}"
+        if page_count > 1:
+            count_label += f" (page {page + 1}/{page_count})"
         list_item = xbmcgui.ListItem(label=count_label)
-        xbmcplugin.addDirectoryItem(self.handle, '', list_item, isFolder=False)
+        items.append(('', list_item, False))
         
-        # Add movies
-        for idx, movie in enumerate(self.filtered_movies):
-            list_item = xbmcgui.ListItem(label=movie.get_display_title())
-            
-            # Set info
-            info = {
-                'title': movie.get_display_title(),
-                'plot': movie.plot,
-                'year': movie.year,
-                'duration': movie.runtime * 60 if movie.runtime else 0
-            }
-            list_item.setInfo('video', info)
-            
-            # Set artwork
-            if movie.folder_jpg:
-                # Create composite image if we have overlay
-                composite_img = self.image_processor.create_composite_image(
-                    movie.folder_jpg,
-                    movie.get_video_file_count()
-                )
-                if composite_img:
-                    list_item.setArt({'thumb': composite_img, 'poster': composite_img})
-            
-            # Determine action based on file count
-            if movie.get_video_file_count() == 1 and movie.video_files:
-                # Single file - play directly
-                video_file = os.path.join(movie.path, movie.video_files[0])
-                url = video_file
-                is_folder = False
-                list_item.setProperty('IsPlayable', 'true')
-            elif movie.get_video_file_count() > 1:
-                # Multiple files - show file list
-                url = f'{self.url}?action=show_files&movie_id={idx}'
-                is_folder = True
-            else:
-                # No files - just show details
-                url = f'{self.url}?action=show_details&movie_id={idx}'
-                is_folder = False
-            
-            xbmcplugin.addDirectoryItem(self.handle, url, list_item, isFolder=is_folder)
+        if page > 0:
+            list_item = xbmcgui.ListItem(label='← Previous Page')
+            url = f'{self.url}?action=show_list&page={page - 1}'
+            items.append((url, list_item, True))
+        
+        # Add movies of the page
+        for movie in page_movies:
+            items.append(self.create_movie_item(movie))
+        
+        if page < page_count - 1:
+            list_item = xbmcgui.ListItem(label='Next Page →')
+            url = f'{self.url}?action=show_list&page={page + 1}'
+            items.append((url, list_item, True))
         
         # Add navigation to details
         list_item = xbmcgui.ListItem(label='→ View Details')
         url = f'{self.url}?action=show_details'
-        xbmcplugin.addDirectoryItem(self.handle, url, list_item, isFolder=False)
+        items.append((url, list_item, False))
         
+        xbmcplugin.addDirectoryItems(self.handle, items, len(items))
         xbmcplugin.endOfDirectory(self.handle)
+        
+        # Composite the following pages while the shown one is being made
+        following = self.filtered_movies[start + page_size:start + page_size * (1 + self.WARMUP_PAGES)]
+        if self.resolve_art([movie for movie in following if not movie.art_resolved]):
+            art_changed = True
+        if art_changed:
+            self.movie_cache.put(self.state.get('filters', {}),
+                                 [movie.to_dict() for movie in self.filtered_movies])
+        self.image_processor.warm_up(
+            (movie.folder_jpg, movie.get_video_file_count()) for movie in following if movie.folder_jpg
+        )
+    
+    def get_movie(self, movie_id: int) -> Optional[Movie]:
+        """Get a movie by idMovie without loading the filtered list"""
+        try:
+            movie_data = self.db.get_movie(movie_id)
+        except Exception as e:
+            log(f'Error loading movie {movie_id}: {e}', xbmc.LOGERROR)
+            return None
+        if not movie_data:
+            return None
+        movie = Movie(movie_data)
+        self.resolve_art([movie])
+        return movie
     
     def show_files_for_movie(self, movie_id: int):
         """Show list of video files for a movie"""
         log(f'Showing files for movie {movie_id}')
         
-        if movie_id >= len(self.filtered_movies):
+        movie = self.get_movie(movie_id)
+        if not movie:
             return
         
-        movie = self.filtered_movies[movie_id]
-        
         xbmcplugin.setContent(self.handle, 'files')
         
         # Add back navigation
@@ -230,8 +394,8 @@ class UnifiedBrowserPlugin:
         """Show details view (View 3)"""
         log('Showing details view')
         
-        if movie_id is not None and movie_id < len(self.filtered_movies):
-            movie = self.filtered_movies[movie_id]
+        movie = self.get_movie(movie_id) if movie_id is not None else None
+        if movie:
             # For now, just show a simple view
             # Full implementation would show thumbnails from subfolders
             dialog = xbmcgui.Dialog()
@@ -291,16 +455,43 @@ class UnifiedBrowserPlugin:
             xbmcgui.NOTIFICATION_INFO
         )
     
+    def show_cache_stats(self):
+        """Show thumbnail cache statistics"""
+        stats = self.image_processor.get_cache_stats()
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = f"{stats['hits'] * 100 // lookups}%" if lookups else '-'
+        lines = [
+            f"Thumbnails: {stats['files']}",
+            f"Size: {stats['bytes'] / 1048576:.1f} MB of {stats['max_bytes'] / 1048576:.0f} MB",
+            f"Hits: {stats['hits']}",
+            f"Misses: {stats['misses']}",
+            f"Hit rate: {hit_rate}",
+            f"Evicted: {stats['evictions']}",
+            f"Invalidated: {stats['invalidated']}",
+        ]
+        xbmcgui.Dialog().textviewer(self.addon.getLocalizedString(32031), '\n'.join(lines))
+    
+    def clear_cache(self):
+        """Delete all cached thumbnails"""
+        self.image_processor.clear_cache()
+        xbmcgui.Dialog().notification(
+            self.addon.getAddonInfo('name'),
+            self.addon.getLocalizedString(32405),
+            xbmcgui.NOTIFICATION_INFO
+        )
+    
     def run(self, params: dict):
         """Main entry point"""
         action = params.get('action', [''])[0]
+        self.action = action
         
         log(f'Action: {action}')
         
         if action == 'show_filters':
             self.show_filters_view()
         elif action == 'show_list':
-            self.show_movie_list_view()
+            page = int(params.get('page', ['0'])[0])
+            self.show_movie_list_view(page)
         elif action == 'show_files':
             movie_id = int(params.get('movie_id', ['0'])[0])
             self.show_files_for_movie(movie_id)
@@ -312,6 +503,10 @@ class UnifiedBrowserPlugin:
             self.edit_year_range()
         elif action == 'reset_filters':
             self.reset_filters()
+        elif action == 'cache_stats':
+            self.show_cache_stats()
+        elif action == 'clear_cache':
+            self.clear_cache()
         else:
             # Default: show movie list
             self.show_movie_list_view()
@@ -325,6 +520,10 @@ if __name__ == '__main__':
         # Create and run plugin
         plugin = UnifiedBrowserPlugin()
         plugin.run(params)
+        plugin.report_startup(time.perf_counter())
+        
+        # Finish thumbnails of the shown page, the listing is already shown
+        plugin.finish()
         
     except Exception as e:
         log(f'Plugin error: {e}', xbmc.LOGERROR)
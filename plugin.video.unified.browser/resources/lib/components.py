@@ -0,0 +1,40 @@
+"""Lazy registry of plugin components"""
+import time
+from typing import Any, Callable, Dict
+
+
+class ComponentRegistry:
+    """Create plugin components on first use
+    
+    Every Kodi click starts the plugin in a fresh interpreter, so each
+    action should only import and construct what it actually uses.
+    Components are registered with a factory that does both; the time
+    each factory took is kept for the startup report.
+    """
+    
+    def __init__(self):
+        self.factories: Dict[str, Callable[[], Any]] = {}
+        self.instances: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}  # name -> seconds, including components it used
+    
+    def register(self, name: str, factory: Callable[[], Any]):
+        """Register the factory of a component"""
+        self.factories[name] = factory
+    
+    def get(self, name: str) -> Any:
+        """Get a component, creating it on first use"""
+        if name not in self.instances:
+            start = time.perf_counter()
+            self.instances[name] = self.factories[name]()
+            self.timings[name] = time.perf_counter() - start
+        return self.instances[name]
+    
+    def is_created(self, name: str) -> bool:
+        """Check if a component was used"""
+        return name in self.instances
+    
+    def format_timings(self) -> str:
+        """Format creation times of the used components in creation order"""
+        if not self.timings:
+            return 'none'
+        return ', '.join(f'{name} {seconds * 1000:.1f} ms' for name, seconds in self.timings.items())
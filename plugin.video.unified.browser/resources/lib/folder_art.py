@@ -0,0 +1,100 @@
+"""Bulk resolution of movie folder artwork"""
+import json
+import os
+from typing import Dict, List, Optional
+import xbmc
+import xbmcvfs
+
+
+class FolderArtResolver:
+    """Find folder.jpg of many movies with as few file system calls as possible
+    
+    Artwork Kodi already knows from the MyVideos art table is used when it
+    lies in the movie folder. Other folders are listed once each, however
+    many movies share them, and the result is kept in the addon profile
+    with the folder's modification time; while the folder is unchanged a
+    stat call replaces the listing.
+    """
+    
+    FOLDER_JPG = 'folder.jpg'
+    
+    def __init__(self, profile_path: str):
+        self.cache_file = os.path.join(xbmcvfs.translatePath(profile_path), 'folder_art.json')
+        self.cache: Optional[Dict[str, list]] = None  # folder -> [mtime, file name or None]
+        self.changed = False
+    
+    def _load(self):
+        """Read the folder cache file"""
+        self.cache = {}
+        if not xbmcvfs.exists(self.cache_file):
+            return
+        try:
+            file_obj = xbmcvfs.File(self.cache_file, 'r')
+            content = file_obj.read()
+            file_obj.close()
+            self.cache = json.loads(content)
+        except Exception as e:
+            xbmc.log(f'[UnifiedBrowser] Error reading folder art cache: {e}', xbmc.LOGERROR)
+    
+    def _save(self):
+        """Write the folder cache file if it changed"""
+        if not self.changed:
+            return
+        try:
+            cache_dir = os.path.dirname(self.cache_file)
+            if not xbmcvfs.exists(cache_dir):
+                xbmcvfs.mkdirs(cache_dir)
+            file_obj = xbmcvfs.File(self.cache_file, 'w')
+            file_obj.write(json.dumps(self.cache))
+            file_obj.close()
+            self.changed = False
+        except Exception as e:
+            xbmc.log(f'[UnifiedBrowser] Error writing folder art cache: {e}', xbmc.LOGERROR)
+    
+    def _find_in_folder(self, folder: str) -> Optional[str]:
+        """Get the folder.jpg path of a folder, listing it only if it changed"""
+        try:
+            mtime = xbmcvfs.Stat(folder).st_mtime()
+        except Exception:
+            return None
+        
+        cached = self.cache.get(folder)
+        if cached is None or cached[0] != mtime:
+            try:
+                dirs, files = xbmcvfs.listdir(folder)
+            except Exception:
+                return None
+            name = next((f for f in files if f.lower() == self.FOLDER_JPG), None)
+            cached = [mtime, name]
+            self.cache[folder] = cached
+            self.changed = True
+        
+        return os.path.join(folder, cached[1]) if cached[1] else None
+    
+    def resolve(self, movies: List[Dict]):
+        """Set 'folder_jpg' of movie dictionaries
+        
+        Uses the 'path' and 'art_url' values of each dictionary. Only pass
+        movies that are about to be shown: folders without artwork in the
+        art table cost a stat call each, and a listing if they changed.
+        """
+        if self.cache is None:
+            self._load()
+        
+        folders: Dict[str, Optional[str]] = {}
+        for movie in movies:
+            path = movie.get('path') or ''
+            art_url = movie.get('art_url')
+            if not path:
+                movie['folder_jpg'] = None
+            elif art_url and art_url.startswith(path):
+                # Local artwork found by Kodi's scanner
+                movie['folder_jpg'] = art_url
+            else:
+                if path not in folders:
+                    folders[path] = self._find_in_folder(path)
+                movie['folder_jpg'] = folders[path]
+        
+        self._save()
+        xbmc.log(f'[UnifiedBrowser] Artwork resolved for {len(movies)} movies, '
+                 f'{len(folders)} folders checked', xbmc.LOGDEBUG)
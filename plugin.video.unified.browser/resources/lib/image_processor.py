@@ -1,11 +1,18 @@
 """Image processor for creating composite images with overlay icons"""
 import os
 import hashlib
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from typing import Optional
+from typing import Dict, Iterable, Optional, Tuple
 import xbmc
+import xbmcgui
 import xbmcvfs
 
+from .thumbnail_cache import ThumbnailCache
+
 try:
     from PIL import Image, ImageDraw
     PIL_AVAILABLE = True
@@ -15,12 +22,59 @@ except ImportError:
 
 
 class ImageProcessor:
-    """Create composite images with overlay icons"""
+    """Create composite images with overlay icons
+    
+    Composites are made by a pool of worker threads so listings never wait
+    for PIL: until a composite is cached, the plain folder.jpg is shown.
+    The plugin call waits for the composites of the shown page only,
+    warm-up jobs that haven't started by then are dropped.
+    They are downscaled to the thumbnail size and stored as JPEG in a
+    cache bounded by ThumbnailCache.
+    """
+    
+    # Threads compositing in the background, Pillow releases the GIL while decoding,
+    # resizing and encoding so they run in parallel
+    WORKERS = max(2, min(4, os.cpu_count() or 1))
+    
+    # Home window property holding the start time of a running warm-up,
+    # shared by all plugin calls
+    WARMUP_PROPERTY = 'UnifiedBrowser.WarmUp'
+    
+    # Seconds after which a warm-up mark that wasn't refreshed is stale
+    WARMUP_TIMEOUT = 60
+    
+    # JPEG quality of cached composites
+    JPEG_QUALITY = 85
+    
+    # Share of the cache budget the warm-up may fill
+    WARMUP_BUDGET = 0.9
+    
+    # Bump when the look of composites changes, so old ones aren't used anymore
+    OVERLAY_VERSION = 2
+    
+    # Overlay icons are drawn at this multiple of their size and reduced once, for smooth edges
+    ICON_SUPERSAMPLING = 4
+    
+    # Folder in the cache directory holding overlay icons at the sizes in use
+    OVERLAY_FOLDER = 'overlays'
     
-    def __init__(self, cache_path: str):
+    # Minimum seconds between sweeps of stale and orphaned cache entries
+    SWEEP_INTERVAL = 3600
+    
+    def __init__(self, cache_path: str, thumb_size: int = 200, cache_size_mb: int = 100):
         self.cache_path = cache_path
+        self.thumb_size = thumb_size
         self._ensure_cache_dir()
-        self._create_overlay_icons()
+        self.overlays = {}  # (kind, size) -> icon image
+        self.cache = ThumbnailCache(xbmcvfs.translatePath(cache_path), cache_size_mb * 1024 * 1024)
+        
+        self.executor = None
+        self.pending = set()  # Cache files scheduled but not written yet
+        self.background = set()  # Pending jobs the plugin call doesn't wait for
+        self.stopping = False
+        self.lock = threading.Lock()
+        self.monitor = xbmc.Monitor()
+        self.warming_up = False
     
     def _ensure_cache_dir(self):
         """Ensure cache directory exists"""
@@ -28,16 +82,55 @@ class ImageProcessor:
         if not xbmcvfs.exists(cache_dir):
             xbmcvfs.mkdirs(cache_dir)
     
-    def _create_overlay_icons(self):
-        """Create overlay icon images"""
-        if not PIL_AVAILABLE:
-            return
+    def _get_overlay(self, kind: str, size: int) -> Optional['Image.Image']:
+        """Get an overlay icon at its final size
         
-        # Create blue player icon (for single file)
-        self.player_icon = self._create_player_icon()
+        Each size is drawn once, then kept in memory and in the overlays
+        folder of the cache, so compositing is a plain alpha paste.
         
-        # Create yellow folder icon (for multiple files)
-        self.folder_icon = self._create_folder_icon()
+        Args:
+            kind: 'player' (single file) or 'folder' (multiple files)
+            size: Width and height in pixels
+        """
+        key = (kind, size)
+        with self.lock:
+            icon = self.overlays.get(key)
+        if icon is not None:
+            return icon
+        
+        overlay_dir = os.path.join(xbmcvfs.translatePath(self.cache_path), self.OVERLAY_FOLDER)
+        icon_file = os.path.join(overlay_dir, f'{kind}_{size}_v{self.OVERLAY_VERSION}.png')
+        try:
+            icon = Image.open(icon_file)
+            icon.load()
+        except (OSError, ValueError):
+            icon = self._draw_overlay(kind, size)
+            if icon is None:
+                return None
+            try:
+                os.makedirs(overlay_dir, exist_ok=True)
+                temp_file = f'{icon_file}.{threading.get_ident()}.tmp'
+                icon.save(temp_file, 'PNG')
+                os.replace(temp_file, icon_file)
+            except OSError as e:
+                xbmc.log(f'[UnifiedBrowser] Error saving overlay icon: {e}', xbmc.LOGERROR)
+        
+        with self.lock:
+            self.overlays[key] = icon
+        return icon
+    
+    def _draw_overlay(self, kind: str, size: int) -> Optional['Image.Image']:
+        """Draw an overlay icon at a multiple of its size and reduce it"""
+        draw_size = size * self.ICON_SUPERSAMPLING
+        if kind == 'player':
+            # Blue player icon (for single file)
+            icon = self._create_player_icon(draw_size)
+        else:
+            # Yellow folder icon (for multiple files)
+            icon = self._create_folder_icon(draw_size)
+        if icon is None:
+            return None
+        return icon.resize((size, size), Image.Resampling.LANCZOS)
     
     def _create_player_icon(self, size: int = 64) -> Optional[Image.Image]:
         """Create a blue player icon"""
@@ -97,52 +190,60 @@ class ImageProcessor:
         if not PIL_AVAILABLE:
             return base_image_path
         
-        # Generate cache filename
-        cache_key = f"{base_image_path}_{file_count}"
-        cache_hash = hashlib.md5(cache_key.encode()).hexdigest()
-        cache_file = os.path.join(xbmcvfs.translatePath(self.cache_path), f"composite_{cache_hash}.png")
+        cache_dir = xbmcvfs.translatePath(self.cache_path)
+        cache_key = self._get_cache_key(base_image_path, file_count)
+        source_stamp = self.get_source_stamp(base_image_path)
         
-        # Return cached if exists
-        if xbmcvfs.exists(cache_file):
-            return cache_file
+        # Return cached if it was made from the current source
+        cached_name = self.cache.find(cache_key, source_stamp)
+        if cached_name:
+            return os.path.join(cache_dir, cached_name)
         
         try:
             # Load base image
-            if not xbmcvfs.exists(base_image_path):
+            if source_stamp is None and not xbmcvfs.exists(base_image_path):
                 return None
             
+            # The file name changes with the source, so Kodi's texture cache doesn't keep the old one
+            stamp_hash = hashlib.md5(str(source_stamp).encode()).hexdigest()[:8]
+            cache_file = os.path.join(cache_dir, f"{cache_key}_{stamp_hash}.jpg")
+            
             # Read file using xbmcvfs
             file_obj = xbmcvfs.File(base_image_path, 'rb')
-            image_data = file_obj.read()
+            image_data = bytes(file_obj.readBytes())
             file_obj.close()
             
-            # Load with PIL
+            # Load with PIL, JPEG is decoded at reduced scale close to the thumbnail size
             base_image = Image.open(BytesIO(image_data))
+            base_image.draft('RGB', (self.thumb_size, self.thumb_size))
+            base_image.thumbnail((self.thumb_size, self.thumb_size), Image.Resampling.LANCZOS)
             
-            # Convert to RGBA if needed
-            if base_image.mode != 'RGBA':
-                base_image = base_image.convert('RGBA')
+            # Convert to RGB if needed, the overlay brings its own alpha mask
+            if base_image.mode != 'RGB':
+                base_image = base_image.convert('RGB')
             
-            # Select overlay icon
-            overlay = self.player_icon if file_count == 1 else self.folder_icon
+            # Select overlay icon at its final size
+            icon_size = max(1, min(base_image.width, base_image.height) // 4)
+            margin = max(2, min(base_image.width, base_image.height) // 100)
+            overlay = self._get_overlay('player' if file_count == 1 else 'folder', icon_size)
             
             if overlay is None:
                 return base_image_path
             
             # Calculate position (bottom-right corner)
-            icon_size = min(base_image.width, base_image.height) // 4
-            overlay = overlay.resize((icon_size, icon_size), Image.Resampling.LANCZOS)
-            
             position = (
-                base_image.width - icon_size - 10,
-                base_image.height - icon_size - 10
+                base_image.width - icon_size - margin,
+                base_image.height - icon_size - margin
             )
             
             # Composite images
             base_image.paste(overlay, position, overlay)
             
-            # Save to cache
-            base_image.save(cache_file, 'PNG')
+            # Save to cache, other plugin calls may be making the same composite
+            temp_file = f'{cache_file}.{threading.get_ident()}.tmp'
+            base_image.save(temp_file, 'JPEG', quality=self.JPEG_QUALITY, optimize=True)
+            os.replace(temp_file, cache_file)
+            self.cache.add(os.path.basename(cache_file), base_image_path, source_stamp)
             
             return cache_file
             
@@ -150,15 +251,171 @@ class ImageProcessor:
             xbmc.log(f'[UnifiedBrowser] Error creating composite image: {e}', xbmc.LOGERROR)
             return base_image_path
     
+    @staticmethod
+    def get_source_stamp(base_image_path: str) -> Optional[str]:
+        """Get the modification time and size of a source image
+        
+        Returns:
+            Stamp stored with the composite, None if the image is gone
+        """
+        try:
+            stat = xbmcvfs.Stat(base_image_path)
+            if not stat.st_size():
+                return None
+            return f'{stat.st_mtime()}:{stat.st_size()}'
+        except Exception:
+            return None
+    
+    def _get_cache_key(self, base_image_path: str, file_count: int) -> str:
+        """Get the cache key of a composite image, the start of its file name"""
+        cache_key = f"{base_image_path}_{file_count}_{self.thumb_size}_{self.OVERLAY_VERSION}"
+        cache_hash = hashlib.md5(cache_key.encode()).hexdigest()
+        return f"composite_{cache_hash}"
+    
+    def get_composite_image(self, base_image_path: str, file_count: int) -> str:
+        """Get the cached composite image, or schedule it and return a placeholder
+        
+        The source is stat'ed, a composite made from an older version of it
+        is dropped and made again.
+        
+        Returns:
+            Path to the cached composite, or base_image_path while the
+            composite is being made in the background
+        """
+        if not PIL_AVAILABLE:
+            return base_image_path
+        
+        cache_key = self._get_cache_key(base_image_path, file_count)
+        cached_name = self.cache.lookup(cache_key, self.get_source_stamp(base_image_path))
+        if cached_name:
+            return os.path.join(xbmcvfs.translatePath(self.cache_path), cached_name)
+        
+        self._schedule(base_image_path, file_count, cache_key)
+        return base_image_path
+    
+    def _schedule(self, base_image_path: str, file_count: int, cache_key: str, background: bool = False):
+        """Queue a composite for the worker threads"""
+        self._submit(cache_key, background, self.create_composite_image, base_image_path, file_count)
+    
+    def _submit(self, key: str, background: bool, function, *args):
+        """Run a function on the worker threads unless a job with the key is pending
+        
+        Args:
+            key: Job key, a cache key for composites
+            background: True if the plugin call must not wait for the job
+            function: Function to run with args
+        """
+        with self.lock:
+            if key in self.pending:
+                if not background:
+                    self.background.discard(key)
+                return
+            self.pending.add(key)
+            if background:
+                self.background.add(key)
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.WORKERS)
+        self.executor.submit(self._job, key, function, *args)
+    
+    def _job(self, key: str, function, *args):
+        """Run a scheduled job unless Kodi is shutting down or it was dropped"""
+        try:
+            with self.lock:
+                dropped = self.stopping and key in self.background
+            if not dropped and not self.monitor.abortRequested():
+                function(*args)
+        except Exception as e:
+            xbmc.log(f'[UnifiedBrowser] Error in background job: {e}', xbmc.LOGERROR)
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+                self.background.discard(key)
+    
+    def _sweep(self):
+        """Remove composites of changed or deleted images and orphaned files"""
+        removed = self.cache.sweep(self.get_source_stamp, self.monitor.abortRequested)
+        xbmc.log(f'[UnifiedBrowser] Thumbnail cache sweep removed {removed} files', xbmc.LOGDEBUG)
+    
+    def warm_up(self, images: Iterable[Tuple[str, int]]):
+        """Schedule composites of images that aren't cached yet
+        
+        Skipped while another plugin call is warming up the cache, so
+        repeated navigation doesn't composite the same images twice. The
+        cache sweep is started when it is due either way.
+        
+        Args:
+            images: Pairs of (folder.jpg path, number of video files)
+        """
+        if not PIL_AVAILABLE:
+            return
+        
+        # Not tied to the warm-up, which may be running in another call
+        if time.time() - self.cache.last_sweep > self.SWEEP_INTERVAL:
+            self._submit('sweep', True, self._sweep)
+        
+        window = xbmcgui.Window(10000)
+        started = window.getProperty(self.WARMUP_PROPERTY)
+        if started and time.time() - float(started) < self.WARMUP_TIMEOUT:
+            return
+        window.setProperty(self.WARMUP_PROPERTY, str(time.time()))
+        self.warming_up = True
+        
+        # Stop before the warm-up would evict the thumbnails it just made
+        free_bytes = self.cache.max_bytes * self.WARMUP_BUDGET - self.cache.total_bytes()
+        file_size = self.cache.average_size()
+        
+        scheduled = 0
+        for base_image_path, file_count in images:
+            if (scheduled + 1) * file_size > free_bytes:
+                break
+            cache_key = self._get_cache_key(base_image_path, file_count)
+            if not self.cache.find(cache_key):
+                self._schedule(base_image_path, file_count, cache_key, background=True)
+                scheduled += 1
+        xbmc.log(f'[UnifiedBrowser] Thumbnail warm-up: {scheduled} composites scheduled', xbmc.LOGDEBUG)
+    
+    def wait(self):
+        """Wait until the composites of the shown page are written
+        
+        Call after the listing was handed to Kodi. Warm-up jobs still
+        queued then are dropped, running ones are finished. Returns early
+        when Kodi is shutting down; the remaining jobs then finish without
+        work. The cache index is saved at the end.
+        """
+        if self.executor is None:
+            self.cache.save()
+            return
+        
+        window = xbmcgui.Window(10000)
+        while True:
+            with self.lock:
+                remaining = len(self.pending - self.background)
+            if not remaining or self.monitor.waitForAbort(1):
+                break
+            if self.warming_up:
+                window.setProperty(self.WARMUP_PROPERTY, str(time.time()))
+        
+        with self.lock:
+            self.stopping = True
+        self.executor.shutdown(wait=True)
+        self.executor = None
+        if self.warming_up:
+            window.clearProperty(self.WARMUP_PROPERTY)
+            self.warming_up = False
+        self.cache.save()
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Get statistics of the thumbnail cache, see ThumbnailCache.get_stats()"""
+        return self.cache.get_stats()
+    
     def clear_cache(self):
         """Clear image cache"""
         try:
-            cache_dir = xbmcvfs.translatePath(self.cache_path)
-            if xbmcvfs.exists(cache_dir):
-                dirs, files = xbmcvfs.listdir(cache_dir)
-                for filename in files:
-                    file_path = os.path.join(cache_dir, filename)
-                    xbmcvfs.delete(file_path)
-                xbmc.log('[UnifiedBrowser] Image cache cleared', xbmc.LOGINFO)
+            self.cache.clear()
+            overlay_dir = os.path.join(xbmcvfs.translatePath(self.cache_path), self.OVERLAY_FOLDER)
+            shutil.rmtree(overlay_dir, ignore_errors=True)
+            with self.lock:
+                self.overlays = {}
+            xbmc.log('[UnifiedBrowser] Image cache cleared', xbmc.LOGINFO)
         except Exception as e:
             xbmc.log(f'[UnifiedBrowser] Error clearing cache: {e}', xbmc.LOGERROR)
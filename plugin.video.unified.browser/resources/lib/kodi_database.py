@@ -5,13 +5,21 @@ from typing import List, Dict, Optional, Set
 import xbmc
 import xbmcvfs
 
+from .movie_query import MovieFilterQuery
+from .search_index import SearchIndex
+
 
 class KodiDatabase:
     """Interface to Kodi's MyVideos database"""
     
-    def __init__(self):
+    # Separator of values joined with GROUP_CONCAT (ASCII unit separator)
+    LIST_SEPARATOR = '\x1f'
+    
+    def __init__(self, search_index: Optional[SearchIndex] = None):
         self.db_path = self._find_database()
         self.connection = None
+        self.search_index = search_index
+        self.search_attached = False
         
     def _find_database(self) -> str:
         """Find the Kodi video database"""
@@ -52,6 +60,12 @@ class KodiDatabase:
             db_uri = f'file:{self.db_path}?mode=ro'
             self.connection = sqlite3.connect(db_uri, uri=True)
             self.connection.row_factory = sqlite3.Row
+            # Word filters without the search index, matching like FTS5
+            self.connection.create_function(
+                MovieFilterQuery.MATCH_FUNCTION, 3,
+                MovieFilterQuery.matches_word,
+                deterministic=True
+            )
         except Exception as e:
             xbmc.log(f'[UnifiedBrowser] Error connecting to database: {e}', xbmc.LOGERROR)
             raise
@@ -61,15 +75,32 @@ class KodiDatabase:
         if self.connection:
             self.connection.close()
             self.connection = None
+            self.search_attached = False
     
-    def get_movies(self, 
-                   year_from: Optional[int] = None,
-                   year_to: Optional[int] = None,
-                   include_genres: Optional[Set[str]] = None,
-                   exclude_genres: Optional[Set[str]] = None,
-                   include_tags: Optional[Set[str]] = None,
-                   exclude_tags: Optional[Set[str]] = None) -> List[Dict]:
-        """Get movies from database with optional filters
+    def _attach_search_index(self) -> bool:
+        """Update the search index and attach it to the connection
+        
+        Returns:
+            True if word filters can use the index
+        """
+        if self.search_attached:
+            return True
+        if not self.search_index or not self.search_index.update(self.connection, self.db_path):
+            return False
+        try:
+            self.search_index.attach(self.connection)
+            self.search_attached = True
+        except sqlite3.Error as e:
+            xbmc.log(f'[UnifiedBrowser] Error attaching search index: {e}', xbmc.LOGERROR)
+        return self.search_attached
+    
+    def get_movies(self, filters: Optional[Dict] = None) -> List[Dict]:
+        """Get movies from database matching the filter state
+        
+        Args:
+            filters: Filters as saved by StateManager (years, genres, tags
+                and words); all of them are evaluated by SQLite, words
+                through the search index if one was given
         
         Returns list of dictionaries with movie information:
         - idMovie: database ID
@@ -78,7 +109,13 @@ class KodiDatabase:
         - c07: year
         - c11: runtime (minutes)
         - c14: genre (comma-separated)
-        - c19: folder path
+        - path: folder path
+        - art_url: poster or thumb from the art table, if any
+        - tags: set of tag names
+        - video_files: sorted file names in the movie folder
+        
+        Tags and files are aggregated per movie and per path in the same
+        query, so the number of queries doesn't grow with the library.
         """
         if not self.connection:
             self.connect()
@@ -91,78 +128,111 @@ class KodiDatabase:
                 m.c07 as year,
                 m.c11 as runtime,
                 m.c14 as genre_str,
-                p.strPath as path
+                p.strPath as path,
+                (
+                    SELECT a.url FROM art a
+                    WHERE a.media_id = m.idMovie AND a.media_type = 'movie'
+                    AND a.type IN ('poster', 'thumb')
+                    ORDER BY a.type = 'thumb'
+                    LIMIT 1
+                ) AS art_url,
+                mt.tag_str,
+                pf.files_str
             FROM movie m
             LEFT JOIN files f ON m.idFile = f.idFile
             LEFT JOIN path p ON f.idPath = p.idPath
-            WHERE 1=1
+            LEFT JOIN (
+                SELECT tl.media_id, GROUP_CONCAT(t.name, char(31)) AS tag_str
+                FROM tag_link tl
+                JOIN tag t ON t.tag_id = tl.tag_id
+                WHERE tl.media_type = 'movie'
+                GROUP BY tl.media_id
+            ) mt ON mt.media_id = m.idMovie
+            LEFT JOIN (
+                SELECT idPath, GROUP_CONCAT(strFilename, char(31)) AS files_str
+                FROM files
+                GROUP BY idPath
+            ) pf ON pf.idPath = f.idPath
+            WHERE {where}
         """
-        params = []
-        
-        # Year filters
-        if year_from is not None:
-            query += " AND CAST(m.c07 AS INTEGER) >= ?"
-            params.append(year_from)
-        if year_to is not None:
-            query += " AND CAST(m.c07 AS INTEGER) <= ?"
-            params.append(year_to)
+        filter_query = MovieFilterQuery(filters)
+        if filter_query.has_word_filters() and self._attach_search_index():
+            filter_query.fts_schema = SearchIndex.SCHEMA
+        where, params = filter_query.build()
+        query = query.format(where=where)
         
         cursor = self.connection.cursor()
         cursor.execute(query, params)
         
-        movies = []
-        for row in cursor.fetchall():
-            movie = dict(row)
-            
-            # Parse genres
-            genre_str = movie.get('genre_str', '') or ''
-            movie_genres = set(g.strip() for g in genre_str.split('/') if g.strip())
-            movie['genres'] = movie_genres
-            
-            # Get tags for this movie
-            movie_tags = self._get_movie_tags(movie['idMovie'])
-            movie['tags'] = movie_tags
-            
-            # Apply genre filters
-            if include_genres:
-                if not movie_genres.intersection(include_genres):
-                    continue
-            if exclude_genres:
-                if movie_genres.intersection(exclude_genres):
-                    continue
-            
-            # Apply tag filters
-            if include_tags:
-                if not movie_tags.intersection(include_tags):
-                    continue
-            if exclude_tags:
-                if movie_tags.intersection(exclude_tags):
-                    continue
-            
-            movies.append(movie)
-        
-        return movies
+        return [self._movie_from_row(row) for row in cursor.fetchall()]
     
-    def _get_movie_tags(self, movie_id: int) -> Set[str]:
-        """Get tags for a specific movie"""
+    def get_movie(self, movie_id: int) -> Optional[Dict]:
+        """Get a single movie by idMovie
+        
+        Returns a dictionary like the ones from get_movies(), or None if
+        the movie is not in the database. Tags and files are aggregated
+        by correlated subqueries, so only the rows of this movie are read.
+        """
         if not self.connection:
-            return set()
+            self.connect()
         
         query = """
-            SELECT t.name
-            FROM tag t
-            JOIN tag_link tl ON t.tag_id = tl.tag_id
-            WHERE tl.media_id = ? AND tl.media_type = 'movie'
+            SELECT 
+                m.idMovie,
+                m.c00 as title,
+                m.c01 as plot,
+                m.c07 as year,
+                m.c11 as runtime,
+                m.c14 as genre_str,
+                p.strPath as path,
+                (
+                    SELECT a.url FROM art a
+                    WHERE a.media_id = m.idMovie AND a.media_type = 'movie'
+                    AND a.type IN ('poster', 'thumb')
+                    ORDER BY a.type = 'thumb'
+                    LIMIT 1
+                ) AS art_url,
+                (
+                    SELECT GROUP_CONCAT(t.name, char(31))
+                    FROM tag_link tl
+                    JOIN tag t ON t.tag_id = tl.tag_id
+                    WHERE tl.media_id = m.idMovie AND tl.media_type = 'movie'
+                ) AS tag_str,
+                (
+                    SELECT GROUP_CONCAT(pf.strFilename, char(31))
+                    FROM files pf
+                    WHERE pf.idPath = f.idPath
+                ) AS files_str
+            FROM movie m
+            LEFT JOIN files f ON m.idFile = f.idFile
+            LEFT JOIN path p ON f.idPath = p.idPath
+            WHERE m.idMovie = ?
         """
-        
         cursor = self.connection.cursor()
         cursor.execute(query, (movie_id,))
+        row = cursor.fetchone()
         
-        tags = set()
-        for row in cursor.fetchall():
-            tags.add(row[0])
+        return self._movie_from_row(row) if row else None
+    
+    def _movie_from_row(self, row: sqlite3.Row) -> Dict:
+        """Convert a movie row with aggregated tags and files to a dictionary"""
+        movie = dict(row)
         
-        return tags
+        # Parse genres
+        genre_str = movie.get('genre_str', '') or ''
+        movie_genres = set(g.strip() for g in genre_str.split('/') if g.strip())
+        movie['genres'] = movie_genres
+        
+        movie['tags'] = self._split_list(movie.pop('tag_str', None))
+        movie['video_files'] = sorted(self._split_list(movie.pop('files_str', None)))
+        
+        return movie
+    
+    def _split_list(self, value: Optional[str]) -> Set[str]:
+        """Split a GROUP_CONCAT value into a set"""
+        if not value:
+            return set()
+        return set(value.split(self.LIST_SEPARATOR))
     
     def get_all_genres(self) -> List[str]:
         """Get all unique genres from database"""
@@ -0,0 +1,100 @@
+"""Persistent cache of the filtered movie list"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+import xbmc
+import xbmcvfs
+
+
+class MovieCache:
+    """Keep the movies of the last filter state in the addon profile
+    
+    Every plugin call is a new process, so without the cache each
+    navigation would query MyVideos again. The cache stores the built
+    movie records together with the filters they were loaded for and the
+    modification time and size of the MyVideos file; a stat call is
+    enough to tell if it is still valid. The folder.jpg of a record is
+    resolved when its movie is first shown and stored with the list.
+    """
+    
+    # Bump when the format of cached records changes
+    VERSION = 3
+    
+    def __init__(self, profile_path: str, db_path: str):
+        self.cache_file = os.path.join(xbmcvfs.translatePath(profile_path), 'movie_cache.json')
+        self.db_path = db_path
+    
+    def _marker(self) -> Optional[str]:
+        """Change marker of the MyVideos database file"""
+        try:
+            stat = xbmcvfs.Stat(self.db_path)
+            return f'{self.VERSION}:{stat.st_mtime()}:{stat.st_size()}'
+        except Exception:
+            return None
+    
+    @staticmethod
+    def _filters_key(filters: Dict[str, Any]) -> str:
+        """Stable representation of a filter state"""
+        return json.dumps(
+            {key: sorted(value) if isinstance(value, (set, list)) else value
+             for key, value in (filters or {}).items()},
+            sort_keys=True
+        )
+    
+    def get(self, filters: Dict[str, Any]) -> Optional[List[Dict]]:
+        """Get cached movie records for the filters
+        
+        Returns:
+            List of records as made by Movie.to_dict(), or None if the
+            cache is missing, stale or was built for other filters
+        """
+        marker = self._marker()
+        if marker is None or not xbmcvfs.exists(self.cache_file):
+            return None
+        
+        try:
+            file_obj = xbmcvfs.File(self.cache_file, 'r')
+            content = file_obj.read()
+            file_obj.close()
+            cache = json.loads(content)
+        except Exception as e:
+            xbmc.log(f'[UnifiedBrowser] Error reading movie cache: {e}', xbmc.LOGERROR)
+            return None
+        
+        if cache.get('marker') != marker or cache.get('filters') != self._filters_key(filters):
+            return None
+        return cache.get('movies')
+    
+    def put(self, filters: Dict[str, Any], movies: List[Dict]):
+        """Store movie records loaded for the filters"""
+        marker = self._marker()
+        if marker is None:
+            return
+        
+        try:
+            cache_dir = os.path.dirname(self.cache_file)
+            if not xbmcvfs.exists(cache_dir):
+                xbmcvfs.mkdirs(cache_dir)
+            
+            # Write a temporary file first, a half-written cache must not be read
+            temp_file = self.cache_file + '.tmp'
+            file_obj = xbmcvfs.File(temp_file, 'w')
+            file_obj.write(json.dumps({
+                'marker': marker,
+                'filters': self._filters_key(filters),
+                'movies': movies,
+            }))
+            file_obj.close()
+            if xbmcvfs.exists(self.cache_file):
+                xbmcvfs.delete(self.cache_file)
+            xbmcvfs.rename(temp_file, self.cache_file)
+        except Exception as e:
+            xbmc.log(f'[UnifiedBrowser] Error writing movie cache: {e}', xbmc.LOGERROR)
+    
+    def clear(self):
+        """Remove the cache file"""
+        try:
+            if xbmcvfs.exists(self.cache_file):
+                xbmcvfs.delete(self.cache_file)
+        except Exception as e:
+            xbmc.log(f'[UnifiedBrowser] Error clearing movie cache: {e}', xbmc.LOGERROR)
@@ -1,8 +1,7 @@
-"""Movie data model and filtering logic"""
+"""Movie data model"""
 import os
-from typing import List, Dict, Set, Optional
+from typing import List, Dict, Optional
 import xbmc
-import xbmcvfs
 
 
 class Movie:
@@ -15,13 +14,30 @@ class Movie:
         self.year = self._parse_year(data.get('year'))
         self.runtime = self._parse_runtime(data.get('runtime'))
         self.path = data.get('path', '')
-        self.genres = data.get('genres', set())
-        self.tags = data.get('tags', set())
-        self.video_files = []
-        self.folder_jpg = None
-        
-        # Find folder.jpg
-        self._find_folder_jpg()
+        self.genres = set(data.get('genres', set()))
+        self.tags = set(data.get('tags', set()))
+        self.video_files = data.get('video_files', [])
+        self.art_url = data.get('art_url')  # Artwork from the MyVideos art table
+        # Resolved by FolderArtResolver once the movie is shown
+        self.folder_jpg = data.get('folder_jpg')
+        self.art_resolved = data.get('art_resolved', False)
+    
+    def to_dict(self) -> Dict:
+        """Get a JSON-serializable record that Movie(data) accepts back"""
+        return {
+            'idMovie': self.id,
+            'title': self.title,
+            'plot': self.plot,
+            'year': self.year,
+            'runtime': self.runtime,
+            'path': self.path,
+            'genres': sorted(self.genres),
+            'tags': sorted(self.tags),
+            'video_files': self.video_files,
+            'art_url': self.art_url,
+            'folder_jpg': self.folder_jpg,
+            'art_resolved': self.art_resolved,
+        }
     
     def _parse_year(self, year_value) -> Optional[int]:
         """Parse year value to int"""
@@ -41,15 +57,6 @@ class Movie:
         except (ValueError, TypeError):
             return None
     
-    def _find_folder_jpg(self):
-        """Find folder.jpg in movie path"""
-        if not self.path:
-            return
-        
-        folder_jpg_path = os.path.join(self.path, 'folder.jpg')
-        if xbmcvfs.exists(folder_jpg_path):
-            self.folder_jpg = folder_jpg_path
-    
     def get_folder_name(self) -> str:
         """Get folder name from path"""
         if self.path:
@@ -78,38 +85,10 @@ class Movie:
             else:
                 return f"{minutes}m"
         return ""
-    
-    def matches_word_filter(self, include_words: str, exclude_words: str) -> bool:
-        """Check if movie matches word filter
-        
-        Args:
-            include_words: Space-separated words to include
-            exclude_words: Space-separated words to exclude
-        
-        Returns:
-            True if movie matches filter
-        """
-        search_text = f"{self.title} {self.plot}".lower()
-        
-        # Check include words (all must be present)
-        if include_words:
-            words = [w.strip().lower() for w in include_words.split() if w.strip()]
-            for word in words:
-                if word not in search_text:
-                    return False
-        
-        # Check exclude words (none must be present)
-        if exclude_words:
-            words = [w.strip().lower() for w in exclude_words.split() if w.strip()]
-            for word in words:
-                if word in search_text:
-                    return False
-        
-        return True
 
 
 class MovieCollection:
-    """Collection of movies with filtering capabilities"""
+    """Collection of movies"""
     
     def __init__(self):
         self.movies: List[Movie] = []
@@ -118,54 +97,6 @@ class MovieCollection:
         """Add movie to collection"""
         self.movies.append(movie)
     
-    def filter_movies(self,
-                      year_from: Optional[int] = None,
-                      year_to: Optional[int] = None,
-                      include_genres: Optional[Set[str]] = None,
-                      exclude_genres: Optional[Set[str]] = None,
-                      include_tags: Optional[Set[str]] = None,
-                      exclude_tags: Optional[Set[str]] = None,
-                      include_words: str = '',
-                      exclude_words: str = '') -> List[Movie]:
-        """Filter movies based on criteria
-        
-        Returns filtered list of movies
-        """
-        filtered = []
-        
-        for movie in self.movies:
-            # Year filter
-            if year_from is not None and movie.year is not None:
-                if movie.year < year_from:
-                    continue
-            if year_to is not None and movie.year is not None:
-                if movie.year > year_to:
-                    continue
-            
-            # Genre filter
-            if include_genres:
-                if not movie.genres.intersection(include_genres):
-                    continue
-            if exclude_genres:
-                if movie.genres.intersection(exclude_genres):
-                    continue
-            
-            # Tag filter
-            if include_tags:
-                if not movie.tags.intersection(include_tags):
-                    continue
-            if exclude_tags:
-                if movie.tags.intersection(exclude_tags):
-                    continue
-            
-            # Word filter
-            if not movie.matches_word_filter(include_words, exclude_words):
-                continue
-            
-            filtered.append(movie)
-        
-        return filtered
-    
     def get_all_genres(self) -> List[str]:
         """Get all unique genres from collection"""
         genres = set()
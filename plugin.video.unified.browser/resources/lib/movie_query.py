@@ -0,0 +1,150 @@
+"""SQL query builder for movie filters"""
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class MovieFilterQuery:
+    """Compile the filter state saved by StateManager into SQL conditions
+    
+    Conditions refer to the movie table as ``m``. Genres and tags are
+    matched through the genre_link/genre and tag_link/tag tables. Words
+    are matched as token prefixes in title or plot, through the FTS5
+    search index when it is attached, otherwise through a SQL function
+    that tokenizes the same way, so both return the same movies.
+    """
+    
+    # SQL function registered by KodiDatabase, see matches_word()
+    MATCH_FUNCTION = 'unified_match'
+    
+    # Token characters of the FTS5 unicode61 tokenizer: letters and digits
+    TOKEN_PATTERN = re.compile(r'[^\W_]+')
+    
+    def __init__(self, filters: Dict[str, Any], fts_schema: Optional[str] = None):
+        self.filters = filters or {}
+        self.fts_schema = fts_schema  # Schema of the attached SearchIndex
+        self.conditions: List[str] = []
+        self.params: List[Any] = []
+    
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        """Split text into lowercase tokens like the FTS5 index does
+        
+        Like unicode61, accents are removed from Latin letters only
+        (Río matches rio, but ё stays different from е).
+        """
+        folded = []
+        for char in unicodedata.normalize('NFD', text.lower()):
+            if unicodedata.combining(char) and folded and folded[-1] < '\u0250':
+                continue
+            folded.append(char)
+        return cls.TOKEN_PATTERN.findall(unicodedata.normalize('NFC', ''.join(folded)))
+    
+    @classmethod
+    def split_words(cls, words: str) -> List[str]:
+        """Split a word filter into lowercase words, dropping words without tokens"""
+        return [w.lower() for w in (words or '').split() if cls.tokenize(w)]
+    
+    @classmethod
+    def matches_word(cls, title: Optional[str], plot: Optional[str], word: str) -> int:
+        """Check if title or plot match a word like the FTS5 query '"word"*'
+        
+        The tokens of the word have to follow each other in one column,
+        the last one as a prefix.
+        
+        Returns:
+            1 on a match, 0 otherwise (SQL function result)
+        """
+        terms = cls.tokenize(word)
+        if not terms:
+            return 0
+        *leading, last = terms
+        for text in (title, plot):
+            tokens = cls.tokenize(text or '')
+            for start in range(len(tokens) - len(terms) + 1):
+                if tokens[start:start + len(leading)] == leading and tokens[start + len(leading)].startswith(last):
+                    return 1
+        return 0
+    
+    def _add(self, condition: str, params: Iterable = ()):
+        """Add a condition with its parameters"""
+        self.conditions.append(condition)
+        self.params.extend(params)
+    
+    def _link_condition(self, table: str, id_column: str, names: Iterable[str], exclude: bool):
+        """Condition on genres or tags linked to the movie"""
+        names = sorted(names)
+        placeholders = ', '.join('?' * len(names))
+        self._add(
+            f"""{'NOT ' if exclude else ''}EXISTS (
+                SELECT 1 FROM {table}_link l
+                JOIN {table} x ON x.{id_column} = l.{id_column}
+                WHERE l.media_id = m.idMovie AND l.media_type = 'movie'
+                AND x.name IN ({placeholders})
+            )""",
+            names
+        )
+    
+    def add_year_filters(self):
+        """Add year range conditions"""
+        if self.filters.get('year_from') is not None:
+            self._add('CAST(m.c07 AS INTEGER) >= ?', [self.filters['year_from']])
+        if self.filters.get('year_to') is not None:
+            self._add('CAST(m.c07 AS INTEGER) <= ?', [self.filters['year_to']])
+    
+    def add_link_filters(self):
+        """Add genre and tag include/exclude conditions"""
+        for table, id_column in (('genre', 'genre_id'), ('tag', 'tag_id')):
+            include = self.filters.get(f'include_{table}s')
+            exclude = self.filters.get(f'exclude_{table}s')
+            if include:
+                # At least one of the genres/tags
+                self._link_condition(table, id_column, include, exclude=False)
+            if exclude:
+                self._link_condition(table, id_column, exclude, exclude=True)
+    
+    def has_word_filters(self) -> bool:
+        """Check if the filters contain include or exclude words"""
+        return bool(self.split_words(self.filters.get('include_words')) or
+                    self.split_words(self.filters.get('exclude_words')))
+    
+    def _match_condition(self, words: List[str], operator: str, exclude: bool):
+        """Condition on movies found by an FTS5 query"""
+        terms = ['"{}"*'.format(word.replace('"', '""')) for word in words]
+        self._add(
+            f"""m.idMovie {'NOT ' if exclude else ''}IN (
+                SELECT rowid FROM {self.fts_schema}.movie_fts WHERE movie_fts MATCH ?
+            )""",
+            [f' {operator} '.join(terms)]
+        )
+    
+    def add_word_filters(self):
+        """Add include/exclude word conditions over title and plot"""
+        if self.fts_schema:
+            include = self.split_words(self.filters.get('include_words'))
+            exclude = self.split_words(self.filters.get('exclude_words'))
+            if include:
+                # All of the words
+                self._match_condition(include, 'AND', exclude=False)
+            if exclude:
+                # None of the words
+                self._match_condition(exclude, 'OR', exclude=True)
+            return
+        
+        for word in self.split_words(self.filters.get('include_words')):
+            self._add(f'{self.MATCH_FUNCTION}(m.c00, m.c01, ?) = 1', [word])
+        for word in self.split_words(self.filters.get('exclude_words')):
+            self._add(f'{self.MATCH_FUNCTION}(m.c00, m.c01, ?) = 0', [word])
+    
+    def build(self) -> Tuple[str, List[Any]]:
+        """Build the WHERE clause
+        
+        Returns:
+            Tuple of (SQL condition, parameters)
+        """
+        self.conditions = []
+        self.params = []
+        self.add_year_filters()
+        self.add_link_filters()
+        self.add_word_filters()
+        return ' AND '.join(self.conditions) or '1=1', self.params
@@ -0,0 +1,135 @@
+"""Full-text search index over movie titles and plots"""
+import os
+import sqlite3
+import zlib
+from typing import Dict, Optional
+import xbmc
+import xbmcvfs
+
+
+class SearchIndex:
+    """Sidecar SQLite FTS5 index of the MyVideos movie table
+    
+    The index lives in the addon_data folder and is attached to the
+    read-only MyVideos connection, so word filters become FTS MATCH
+    subqueries. It is refreshed incrementally: a marker made of the
+    MyVideos file mtime, movie count and highest idMovie tells whether
+    anything changed at all, and a per-movie fingerprint of title and
+    plot tells which rows have to be re-indexed.
+    """
+    
+    # Schema name of the attached index
+    SCHEMA = 'fts'
+    
+    # SQL function registered on the MyVideos connection
+    FINGERPRINT_FUNCTION = 'unified_fingerprint'
+    
+    # Movies fetched per query when re-indexing
+    CHUNK_SIZE = 500
+    
+    def __init__(self, profile_path: str):
+        self.index_path = os.path.join(xbmcvfs.translatePath(profile_path), 'search_index.db')
+        self.available = self._fts5_available()
+    
+    @staticmethod
+    def _fts5_available() -> bool:
+        """Check if the SQLite library has FTS5 compiled in"""
+        try:
+            connection = sqlite3.connect(':memory:')
+            connection.execute('CREATE VIRTUAL TABLE t USING fts5(x)')
+            connection.close()
+            return True
+        except sqlite3.Error:
+            xbmc.log('[UnifiedBrowser] SQLite FTS5 not available, matching words without the search index', xbmc.LOGINFO)
+            return False
+    
+    @staticmethod
+    def fingerprint(title: Optional[str], plot: Optional[str]) -> int:
+        """Change marker of a movie's searchable text"""
+        return zlib.crc32(f'{title or ""}\x1f{plot or ""}'.encode('utf-8'))
+    
+    def _open(self) -> sqlite3.Connection:
+        """Open the index for writing, creating the tables if needed"""
+        index_dir = os.path.dirname(self.index_path)
+        if not xbmcvfs.exists(index_dir):
+            xbmcvfs.mkdirs(index_dir)
+        
+        connection = sqlite3.connect(self.index_path, timeout=10)
+        connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS movie_fts USING fts5(title, plot, tokenize='unicode61')"
+        )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS indexed (idMovie INTEGER PRIMARY KEY, fingerprint INTEGER NOT NULL)'
+        )
+        connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        return connection
+    
+    def update(self, source: sqlite3.Connection, source_path: str) -> bool:
+        """Bring the index up to date with the MyVideos database
+        
+        Args:
+            source: Connection to the MyVideos database
+            source_path: Path of the MyVideos database file
+        
+        Returns:
+            True if the index can be used
+        """
+        if not self.available:
+            return False
+        
+        try:
+            count, max_id = source.execute('SELECT COUNT(*), MAX(idMovie) FROM movie').fetchone()
+            marker = f'{os.path.getmtime(source_path)}:{count}:{max_id}'
+            
+            connection = self._open()
+            try:
+                row = connection.execute("SELECT value FROM meta WHERE key = 'marker'").fetchone()
+                if row and row[0] == marker:
+                    return True
+                self._sync(source, connection)
+                connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('marker', ?)", (marker,))
+                connection.commit()
+            finally:
+                connection.close()
+            return True
+        
+        except Exception as e:
+            xbmc.log(f'[UnifiedBrowser] Error updating search index: {e}', xbmc.LOGERROR)
+            return False
+    
+    def _sync(self, source: sqlite3.Connection, connection: sqlite3.Connection):
+        """Re-index new and changed movies and drop removed ones"""
+        source.create_function(self.FINGERPRINT_FUNCTION, 2, self.fingerprint, deterministic=True)
+        current: Dict[int, int] = dict(source.execute(
+            f'SELECT idMovie, {self.FINGERPRINT_FUNCTION}(c00, c01) FROM movie'
+        ).fetchall())
+        stored: Dict[int, int] = dict(connection.execute('SELECT idMovie, fingerprint FROM indexed').fetchall())
+        
+        removed = [movie_id for movie_id in stored if movie_id not in current]
+        changed = [movie_id for movie_id, value in current.items() if stored.get(movie_id) != value]
+        
+        for movie_id in removed + changed:
+            connection.execute('DELETE FROM movie_fts WHERE rowid = ?', (movie_id,))
+            connection.execute('DELETE FROM indexed WHERE idMovie = ?', (movie_id,))
+        
+        for start in range(0, len(changed), self.CHUNK_SIZE):
+            chunk = changed[start:start + self.CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = source.execute(
+                f'SELECT idMovie, c00, c01 FROM movie WHERE idMovie IN ({placeholders})', chunk
+            ).fetchall()
+            connection.executemany(
+                'INSERT INTO movie_fts (rowid, title, plot) VALUES (?, ?, ?)',
+                [(row[0], row[1] or '', row[2] or '') for row in rows]
+            )
+            connection.executemany(
+                'INSERT INTO indexed (idMovie, fingerprint) VALUES (?, ?)',
+                [(row[0], self.fingerprint(row[1], row[2])) for row in rows]
+            )
+        
+        xbmc.log(f'[UnifiedBrowser] Search index updated: {len(changed)} movies indexed, '
+                 f'{len(removed)} removed', xbmc.LOGDEBUG)
+    
+    def attach(self, source: sqlite3.Connection):
+        """Attach the index read-only to a connection opened with uri=True"""
+        source.execute(f'ATTACH DATABASE ? AS {self.SCHEMA}', (f'file:{self.index_path}?mode=ro',))
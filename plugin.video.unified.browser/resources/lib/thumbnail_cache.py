@@ -0,0 +1,327 @@
+"""Size-bounded thumbnail cache with least-recently-used eviction"""
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+import xbmc
+
+
+class ThumbnailCache:
+    """Track the files of the thumbnail cache directory in a small index
+    
+    The index maps each file name to its size, last access time, source
+    image and the source's modification time and size at the time the
+    thumbnail was made, and keeps hit, miss, eviction and invalidation
+    counters. File names are ``<key>_<stamp>.<ext>``: thumbnails are
+    looked up by key, and a thumbnail remade from a changed source gets
+    a new name. Every plugin call works on its
+    own copy and merges it with the file on disk when saving, so calls
+    running at the same time don't lose each other's entries. Saving
+    evicts the least recently used files until the cache fits the byte
+    budget.
+    """
+    
+    INDEX_FILE = 'index.json'
+    
+    # Start of the names of files made by ImageProcessor
+    FILE_PREFIX = 'composite_'
+    
+    # Assumed size of a thumbnail while the cache is empty
+    DEFAULT_FILE_SIZE = 20 * 1024
+    
+    # Seconds after which a file missing in the index is an orphan,
+    # younger ones may belong to a plugin call that hasn't saved yet
+    ORPHAN_AGE = 3600
+    
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, self.INDEX_FILE)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # file name -> [size, last access, source, source stamp]
+        self.entries: Dict[str, List] = {}
+        self.keys: Dict[str, str] = {}  # key -> file name
+        self.removed: Set[str] = set()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidated': 0}  # Totals saved on disk
+        self.added = {name: 0 for name in self.counters}  # Changes of this call
+        self.last_sweep = 0
+        self.dirty = False
+        self._load()
+    
+    def _read_index(self) -> dict:
+        """Read the index file, rebuilding it from the directory if it is missing"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            xbmc.log(f'[UnifiedBrowser] Error reading thumbnail cache index: {e}', xbmc.LOGERROR)
+        
+        # Files of an older cache without index count as accessed when written
+        entries = {}
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name != self.INDEX_FILE and not entry.name.endswith('.tmp'):
+                        stat = entry.stat()
+                        entries[entry.name] = [stat.st_size, stat.st_mtime]
+        except OSError:
+            pass
+        return {'entries': entries}
+    
+    def _load(self):
+        """Load the index into memory"""
+        index = self._read_index()
+        self.entries = index.get('entries', {})
+        for name in self.counters:
+            self.counters[name] = index.get(name, 0)
+        self.last_sweep = index.get('last_sweep', 0)
+        self.dirty = 'hits' not in index
+        self._update_keys()
+    
+    @staticmethod
+    def get_key(name: str) -> str:
+        """Get the key part of a file name"""
+        return name.rsplit('_', 1)[0]
+    
+    def _update_keys(self):
+        """Rebuild the key lookup from the entries"""
+        self.keys = {self.get_key(name): name for name in self.entries}
+    
+    def lookup(self, key: str, source_stamp: Optional[str] = None) -> Optional[str]:
+        """Find a cached file by key, counting a hit and its access or a miss
+        
+        Args:
+            key: Key of the file
+            source_stamp: Current stamp of the source; a file made from
+                another version of it is removed and counted as a miss
+        """
+        with self.lock:
+            name = self.keys.get(key)
+            stale = name is not None and not self._is_current(name, source_stamp)
+            if name is None or stale:
+                self.added['misses'] += 1
+            else:
+                self.entries[name][1] = time.time()
+                self.added['hits'] += 1
+            self.dirty = True
+        if stale:
+            self._remove(name)
+            return None
+        return name
+    
+    def find(self, key: str, source_stamp: Optional[str] = None) -> Optional[str]:
+        """Find a cached file by key without counting it as an access
+        
+        A file made from another version of the source is removed.
+        """
+        with self.lock:
+            name = self.keys.get(key)
+            stale = name is not None and not self._is_current(name, source_stamp)
+        if stale:
+            self._remove(name)
+            return None
+        return name
+    
+    def _is_current(self, name: str, source_stamp: Optional[str]) -> bool:
+        """Check if a file was made from the source version with the stamp, True if it is unknown"""
+        if source_stamp is None:
+            return True
+        entry = self.entries.get(name)
+        return entry is None or (len(entry) >= 4 and entry[3] == source_stamp)
+    
+    def add(self, name: str, source: str, source_stamp: Optional[str]):
+        """Register a file written to the cache directory
+        
+        Args:
+            name: File name in the cache directory
+            source: Path of the image the file was made from
+            source_stamp: Modification time and size of the source
+        """
+        try:
+            size = os.path.getsize(os.path.join(self.cache_dir, name))
+        except OSError:
+            return
+        key = self.get_key(name)
+        with self.lock:
+            previous = self.keys.get(key)
+            self.entries[name] = [size, time.time(), source, source_stamp]
+            self.keys[key] = name
+            self.removed.discard(name)
+            self.dirty = True
+        
+        # Thumbnail made from an older version of the source
+        if previous and previous != name:
+            self._remove(previous)
+    
+    def total_bytes(self) -> int:
+        """Get the size of all cached files"""
+        with self.lock:
+            return sum(entry[0] for entry in self.entries.values())
+    
+    def average_size(self) -> int:
+        """Get the average size of a cached file"""
+        with self.lock:
+            if not self.entries:
+                return self.DEFAULT_FILE_SIZE
+            return sum(entry[0] for entry in self.entries.values()) // len(self.entries)
+    
+    def _evict(self):
+        """Delete least recently used files until the cache fits the budget"""
+        total = sum(entry[0] for entry in self.entries.values())
+        if total <= self.max_bytes:
+            return
+        for name, entry in sorted(self.entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                xbmc.log(f'[UnifiedBrowser] Error evicting thumbnail {name}: {e}', xbmc.LOGERROR)
+                continue
+            total -= entry[0]
+            del self.entries[name]
+            self.removed.add(name)
+            self.added['evictions'] += 1
+    
+    def _remove(self, name: str):
+        """Delete a cached file and drop its entry"""
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except FileNotFoundError:
+            pass
+        with self.lock:
+            self.entries.pop(name, None)
+            if self.keys.get(self.get_key(name)) == name:
+                del self.keys[self.get_key(name)]
+            self.removed.add(name)
+            self.added['invalidated'] += 1
+            self.dirty = True
+    
+    def sweep(self, get_stamp: Callable[[str], Optional[str]], aborted: Callable[[], bool]) -> int:
+        """Remove stale entries and orphaned files
+        
+        An entry is stale when the stamp of its source changed, the source
+        is gone or it was made by a version that didn't record its source.
+        Files without entry are removed once they are ORPHAN_AGE old.
+        
+        Args:
+            get_stamp: Function returning the current stamp of a source, or None
+            aborted: Function telling the sweep to stop
+        
+        Returns:
+            Number of removed files
+        """
+        with self.lock:
+            self.last_sweep = time.time()
+            self.dirty = True
+            entries = list(self.entries.items())
+        
+        removed = 0
+        for name, entry in entries:
+            if aborted():
+                return removed
+            if len(entry) < 4 or get_stamp(entry[2]) != entry[3]:
+                self._remove(name)
+                removed += 1
+        
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for file_entry in it:
+                    if file_entry.name == self.INDEX_FILE or file_entry.name in self.entries:
+                        continue
+                    if file_entry.is_file() and time.time() - file_entry.stat().st_mtime > self.ORPHAN_AGE:
+                        self._remove(file_entry.name)
+                        removed += 1
+        except OSError as e:
+            xbmc.log(f'[UnifiedBrowser] Error sweeping thumbnail cache: {e}', xbmc.LOGERROR)
+        
+        return removed
+    
+    def save(self):
+        """Merge with the index on disk, evict and write the index"""
+        with self.lock:
+            if not self.dirty:
+                return
+            
+            # Entries written or used by other plugin calls since loading
+            disk = self._read_index()
+            disk_entries = disk.get('entries', {})
+            for name, entry in disk_entries.items():
+                if name in self.removed:
+                    continue
+                own = self.entries.get(name)
+                if own is None or own[1] < entry[1]:
+                    self.entries[name] = entry
+            
+            # Entries evicted by other plugin calls
+            for name in [name for name in self.entries if name not in disk_entries]:
+                if not os.path.exists(os.path.join(self.cache_dir, name)):
+                    del self.entries[name]
+            
+            self._evict()
+            self._update_keys()
+            
+            self.last_sweep = max(self.last_sweep, disk.get('last_sweep', 0))
+            index = {'entries': self.entries, 'last_sweep': self.last_sweep}
+            for name, value in self.added.items():
+                index[name] = disk.get(name, self.counters[name]) + value
+            
+            try:
+                temp_file = f'{self.index_file}.{threading.get_ident()}.tmp'
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(index, f)
+                os.replace(temp_file, self.index_file)
+            except OSError as e:
+                xbmc.log(f'[UnifiedBrowser] Error writing thumbnail cache index: {e}', xbmc.LOGERROR)
+                return
+            
+            for name in self.counters:
+                self.counters[name] = index[name]
+                self.added[name] = 0
+            self.removed.clear()
+            self.dirty = False
+    
+    def clear(self):
+        """Delete all thumbnails and the index
+        
+        Only files the cache owns are deleted, the cache path is a free
+        text setting and may point at a folder with other files.
+        """
+        with self.lock:
+            try:
+                with os.scandir(self.cache_dir) as it:
+                    names = [entry.name for entry in it if entry.is_file()]
+            except OSError:
+                names = []
+            for name in names:
+                if (name in self.entries or name.startswith(self.FILE_PREFIX)
+                        or name.startswith(self.INDEX_FILE)):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError as e:
+                        xbmc.log(f'[UnifiedBrowser] Error deleting thumbnail {name}: {e}', xbmc.LOGERROR)
+            self.entries = {}
+            self.keys = {}
+            self.removed.clear()
+            self.last_sweep = 0
+            self.counters = {name: 0 for name in self.counters}
+            self.added = {name: 0 for name in self.added}
+            self.dirty = False
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get file count, size, budget and counters of the cache"""
+        with self.lock:
+            stats = {
+                'files': len(self.entries),
+                'bytes': sum(entry[0] for entry in self.entries.values()),
+                'max_bytes': self.max_bytes,
+            }
+            for name, value in self.counters.items():
+                stats[name] = value + self.added[name]
+            return stats
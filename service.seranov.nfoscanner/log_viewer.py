@@ -1,6 +1,7 @@
 """Log Viewer Script - Shows the scanner log in a text viewer"""
 import sys
 import os
+import time
 import xbmc
 import xbmcaddon
 import xbmcgui
@@ -14,23 +15,92 @@ sys.path.insert(0, addon_path)
 
 # Import log manager
 from resources.lib.plugin_log import PluginLog
+from resources.lib.scan_metrics import ScanMetrics
+
+
+# Log records shown per page
+PAGE_SIZE = 200
+
+# Time window choices: (string id, seconds, 0 for no limit)
+TIME_WINDOWS = [
+    (32120, 0),  # All
+    (32121, 3600),  # Last hour
+    (32122, 24 * 3600),  # Last 24 hours
+    (32123, 7 * 24 * 3600),  # Last 7 days
+]
+
+
+def choose_level(dialog, current):
+    """Ask for the lowest log level to show"""
+    levels = sorted(PluginLog.LEVEL_NAMES)
+    index = dialog.select(addon.getLocalizedString(32117), [PluginLog.LEVEL_NAMES[level] for level in levels],
+                          preselect=levels.index(current))
+    return levels[index] if index >= 0 else current
+
+
+def choose_time_window(dialog, current):
+    """Ask for the time window to show"""
+    seconds = [window for _, window in TIME_WINDOWS]
+    index = dialog.select(addon.getLocalizedString(32119),
+                          [addon.getLocalizedString(string_id) for string_id, _ in TIME_WINDOWS],
+                          preselect=seconds.index(current))
+    return seconds[index] if index >= 0 else current
 
 
 def show_log():
-    """Display the log file in a text viewer dialog"""
+    """Display the log page by page with level, path and time filters"""
     try:
         # Create log manager instance
         log_manager = PluginLog(addon)
+        dialog = xbmcgui.Dialog()
         
-        # Read the log file
-        log_content = log_manager.read_log()
+        min_level = PluginLog.DEBUG
+        path_prefix = ''
+        window = 0
+        page = 0
         
-        # Show in a text viewer dialog
-        dialog = xbmcgui.Dialog()
-        dialog.textviewer(
-            addon.getLocalizedString(32110),  # Scanner Log
-            log_content
-        )
+        while True:
+            since = time.time() - window if window else 0
+            records, has_more = log_manager.query(min_level, path_prefix, since,
+                                                  page * PAGE_SIZE, PAGE_SIZE)
+            
+            # Oldest first within the page, like the log file
+            lines = [PluginLog.format_record(record) for record in reversed(records)]
+            text = '\n'.join(lines) if lines else addon.getLocalizedString(32125)  # No matching entries
+            title = addon.getLocalizedString(32124).format(page + 1)  # Scanner Log - page {0}
+            dialog.textviewer(title, text)
+            
+            # Navigation and filter menu
+            options = []
+            if has_more:
+                options.append(('older', addon.getLocalizedString(32115)))
+            if page > 0:
+                options.append(('newer', addon.getLocalizedString(32116)))
+            options += [
+                ('level', f'{addon.getLocalizedString(32117)}: {PluginLog.LEVEL_NAMES[min_level]}'),
+                ('path', f'{addon.getLocalizedString(32118)}: {path_prefix}'),
+                ('time', addon.getLocalizedString(32119) + ': ' + addon.getLocalizedString(
+                    next(string_id for string_id, seconds in TIME_WINDOWS if seconds == window))),
+            ]
+            index = dialog.select(addon.getLocalizedString(32110), [label for _, label in options])
+            if index < 0:
+                break
+            
+            choice = options[index][0]
+            if choice == 'older':
+                page += 1
+                continue
+            if choice == 'newer':
+                page -= 1
+                continue
+            if choice == 'level':
+                min_level = choose_level(dialog, min_level)
+            elif choice == 'path':
+                path_prefix = dialog.input(addon.getLocalizedString(32118), path_prefix)
+            elif choice == 'time':
+                window = choose_time_window(dialog, window)
+            # Filters changed, start from the newest entries
+            page = 0
         
     except Exception as e:
         xbmc.log(f'[{addon.getAddonInfo("id")}] Error showing log: {e}', xbmc.LOGERROR)
@@ -69,6 +139,28 @@ def clear_log():
         )
 
 
+def show_stats():
+    """Display scanner statistics in a text viewer dialog"""
+    try:
+        stats = ScanMetrics.load(ScanMetrics(addon).stats_file)
+        if stats:
+            report = ScanMetrics.format_report(stats)
+        else:
+            report = addon.getLocalizedString(32114)  # No statistics collected yet
+        
+        xbmcgui.Dialog().textviewer(
+            addon.getLocalizedString(32113),  # Scanner Statistics
+            report
+        )
+    
+    except Exception as e:
+        xbmc.log(f'[{addon.getAddonInfo("id")}] Error showing statistics: {e}', xbmc.LOGERROR)
+        xbmcgui.Dialog().ok(
+            addon.getLocalizedString(32100),  # NFO Scanner
+            f'Error loading statistics: {e}'
+        )
+
+
 def handle_action():
     """Handle command line action"""
     if len(sys.argv) > 1:
@@ -81,6 +173,8 @@ def handle_action():
             show_log()
         elif action == 'clear_log':
             clear_log()
+        elif action == 'view_stats':
+            show_stats()
         else:
             xbmc.log(f'[{addon.getAddonInfo("id")}] Unknown action: {action}', xbmc.LOGWARNING)
     else:
@@ -0,0 +1,38 @@
+"""Directory Listing - Single-pass os.scandir listing of local folders"""
+import os
+from typing import Dict, Iterable
+
+
+class DirListing:
+    """Contents of a folder relevant to the scanner"""
+    __slots__ = ('dirs', 'files')
+    
+    def __init__(self, dirs: Dict[str, float], files: Dict[str, float]):
+        self.dirs = dirs  # Subfolder name -> modification time
+        self.files = files  # Name of a wanted file -> modification time
+
+
+def list_local(path: str, wanted_files: Iterable[str]) -> DirListing:
+    """List a local folder with os.scandir
+    
+    Entry types come from the directory listing itself, so only subfolders
+    and files in ``wanted_files`` that are present get a stat call. Missing
+    wanted files are simply absent from the result.
+    
+    Raises:
+        OSError: The folder can't be listed
+    """
+    wanted = frozenset(wanted_files)
+    dirs = {}
+    files = {}
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    dirs[entry.name] = entry.stat().st_mtime
+                elif entry.name in wanted and entry.is_file():
+                    files[entry.name] = entry.stat().st_mtime
+            except OSError:
+                # Vanished while listing or a broken link
+                continue
+    return DirListing(dirs, files)
@@ -0,0 +1,222 @@
+"""File System Watcher - inotify based change notifications for local sources"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from .nfo_paths import CATEGORY_NFO, MOVIE_NFO, is_local
+
+# inotify event flags (see inotify(7))
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_libc():
+    """Load the C library if it provides inotify"""
+    if not sys.platform.startswith('linux'):
+        return None
+    for name in (ctypes.util.find_library('c'), 'libc.so.6', 'libc.so'):
+        if not name:
+            continue
+        try:
+            libc = ctypes.CDLL(name, use_errno=True)
+            if hasattr(libc, 'inotify_init1'):
+                return libc
+        except OSError:
+            continue
+    return None
+
+
+class InotifyWatcher:
+    """Watches local folders with inotify and reports changed folders
+    
+    Folders are registered one by one as the scanner visits them. Events are
+    collected and flushed to ``on_change`` after a short quiet period, as a
+    dictionary of ``{folder path: depth}`` where depth is 0 when only the
+    folder itself needs a rescan and None when its whole subtree does.
+    """
+    
+    # Seconds without new events before collected changes are reported
+    DEBOUNCE = 2.0
+    
+    def __init__(self, on_change: Callable[[Dict[str, Optional[int]]], None],
+                 log: Callable[[str], None] = None):
+        self.on_change = on_change
+        self.log = log
+        self.libc = _load_libc()
+        self.fd = -1
+        self.watches: Dict[int, str] = {}  # watch descriptor -> folder path
+        self.watched = set()
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.changes: Dict[str, Optional[int]] = {}
+        self.last_event = 0
+    
+    def is_available(self) -> bool:
+        """Check if inotify is available on this platform"""
+        return self.libc is not None
+    
+    def start(self) -> bool:
+        """Start watching
+        
+        Returns:
+            False if inotify is not available
+        """
+        if self.running:
+            return True
+        if not self.is_available():
+            return False
+        
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            self._log(f'inotify_init1 failed: {os.strerror(ctypes.get_errno())}')
+            return False
+        
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='NFOScanWatcher')
+        self.thread.daemon = True
+        self.thread.start()
+        return True
+    
+    def stop(self):
+        """Stop watching and release all watches"""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+            self.thread = None
+        with self.lock:
+            if self.fd >= 0:
+                os.close(self.fd)
+                self.fd = -1
+            self.watches.clear()
+            self.watched.clear()
+            self.changes.clear()
+    
+    def watch(self, path: str):
+        """Start watching a folder (not recursive)"""
+        if not self.running or not is_local(path):
+            return
+        path = path.rstrip('/') or '/'
+        with self.lock:
+            if path in self.watched or self.fd < 0:
+                return
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    self._log('inotify watch limit reached, '
+                              'increase fs.inotify.max_user_watches to watch all folders')
+                return
+            self.watches[wd] = path
+            self.watched.add(path)
+    
+    def is_watched(self, path: str) -> bool:
+        """Check if a folder is being watched"""
+        with self.lock:
+            return (path.rstrip('/') or '/') in self.watched
+    
+    def _log(self, msg: str):
+        """Log a message if a logger was given"""
+        if self.log:
+            self.log(msg)
+    
+    def _add_change(self, path: str, depth: Optional[int]):
+        """Record a changed folder, keeping the widest requested depth"""
+        if path in self.changes and (self.changes[path] is None or depth is not None):
+            return
+        self.changes[path] = depth
+    
+    def _handle_event(self, wd: int, mask: int, name: str):
+        """Translate one inotify event into folder changes (caller holds the lock)"""
+        folder = self.watches.get(wd)
+        if folder is None:
+            return
+        
+        if mask & IN_IGNORED:
+            # Watch removed by the kernel (folder deleted or unmounted)
+            del self.watches[wd]
+            self.watched.discard(folder)
+            return
+        
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                # New subfolder: scan all of it
+                self._add_change(os.path.join(folder, name), None)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                # Relisting the parent drops the removed subfolder from the index
+                self._add_change(folder, 0)
+        elif name == MOVIE_NFO:
+            self._add_change(folder, 0)
+        elif name == CATEGORY_NFO:
+            # Genres are inherited by every folder below
+            self._add_change(folder, None)
+    
+    def _read_events(self):
+        """Read and handle all pending events"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+            return
+        
+        offset = 0
+        with self.lock:
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', errors='surrogateescape')
+                offset += length
+                
+                if mask & IN_Q_OVERFLOW:
+                    self._log('inotify event queue overflowed, changes will be found by the next sweep')
+                    continue
+                self._handle_event(wd, mask, name)
+            if self.changes:
+                self.last_event = time.monotonic()
+    
+    def _flush(self):
+        """Report collected changes once events have settled"""
+        with self.lock:
+            if not self.changes or time.monotonic() - self.last_event < self.DEBOUNCE:
+                return
+            changes = self.changes
+            self.changes = {}
+        try:
+            self.on_change(changes)
+        except Exception as e:
+            self._log(f'Error handling file system changes: {e}')
+    
+    def _run(self):
+        """Watcher thread loop"""
+        while self.running:
+            try:
+                readable, _, _ = select.select([self.fd], [], [], 0.5)
+                if readable:
+                    self._read_events()
+                self._flush()
+            except Exception as e:
+                self._log(f'Error in file system watcher: {e}')
+                time.sleep(1)
@@ -0,0 +1,193 @@
+"""Library Snapshot - In-memory index of Kodi movies keyed by directory"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import xbmc
+
+
+class MovieEntry:
+    """A movie from the Kodi library"""
+    __slots__ = ('movie_id', 'file', 'dateadded', 'genres')
+    
+    def __init__(self, movie_id: int, file: str, dateadded: float, genres: List[str]):
+        self.movie_id = movie_id
+        self.file = file
+        self.dateadded = dateadded
+        self.genres = genres
+
+
+class LibrarySnapshot:
+    """One-shot snapshot of all movies in the Kodi library
+    
+    Movies are fetched once per scan pass with paged ``VideoLibrary.GetMovies``
+    calls and indexed by the directory containing the movie file, so folder
+    lookups during the pass are dictionary hits instead of JSON-RPC queries.
+    """
+    
+    # Number of movies requested per JSON-RPC call
+    PAGE_SIZE = 5000
+    
+    # Disc structure folders: the movie belongs to their parent folder
+    DISC_FOLDERS = ('VIDEO_TS', 'BDMV')
+    
+    def __init__(self, metrics=None):
+        self.metrics = metrics  # Optional ScanMetrics counting JSON-RPC calls
+        self.by_dir: Dict[str, MovieEntry] = {}
+        self.by_id: Dict[int, str] = {}
+        self.loaded_at = 0
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def normalize_dir(path: str) -> str:
+        """Normalize a directory path for use as an index key"""
+        return path.rstrip('/\\')
+    
+    @classmethod
+    def movie_dir(cls, file_path: str) -> str:
+        """Get the movie folder for a library file path"""
+        if file_path.startswith('stack://'):
+            # stack://first.avi , second.avi
+            file_path = file_path[len('stack://'):].split(' , ')[0]
+        
+        directory = os.path.dirname(file_path)
+        if os.path.basename(directory).upper() in cls.DISC_FOLDERS:
+            directory = os.path.dirname(directory)
+        return cls.normalize_dir(directory)
+    
+    @staticmethod
+    def parse_date(date_str: str) -> float:
+        """Convert Kodi dateadded string to timestamp"""
+        if not date_str:
+            return 0
+        try:
+            return datetime.fromisoformat(date_str.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return 0
+    
+    def _fetch(self) -> Optional[Dict[str, MovieEntry]]:
+        """Fetch all movies from the Kodi library, indexed by folder
+        
+        Returns:
+            Movies by folder, or None if the library could not be read
+        """
+        by_dir = {}
+        start = 0
+        while True:
+            request = json.dumps({
+                "jsonrpc": "2.0",
+                "method": "VideoLibrary.GetMovies",
+                "params": {
+                    "properties": ["file", "dateadded", "genre"],
+                    "limits": {"start": start, "end": start + self.PAGE_SIZE}
+                },
+                "id": 1
+            })
+            if self.metrics:
+                with self.metrics.jsonrpc(['VideoLibrary.GetMovies']):
+                    response = xbmc.executeJSONRPC(request)
+            else:
+                response = xbmc.executeJSONRPC(request)
+            result = json.loads(response)
+            if 'result' not in result:
+                return None
+            
+            movies = result['result'].get('movies', [])
+            for movie in movies:
+                file_path = movie.get('file', '')
+                if not file_path:
+                    continue
+                by_dir[self.movie_dir(file_path)] = MovieEntry(
+                    movie.get('movieid'),
+                    file_path,
+                    self.parse_date(movie.get('dateadded', '')),
+                    movie.get('genre', [])
+                )
+            
+            total = result['result'].get('limits', {}).get('total', 0)
+            start += self.PAGE_SIZE
+            if not movies or start >= total:
+                break
+        
+        return by_dir
+    
+    def _replace(self, by_dir: Dict[str, MovieEntry]):
+        """Swap in a freshly fetched index"""
+        with self.lock:
+            self.by_dir = by_dir
+            self.by_id = {movie.movie_id: directory for directory, movie in by_dir.items()}
+            self.loaded_at = time.time()
+    
+    def load(self) -> bool:
+        """Fetch all movies from the Kodi library
+        
+        Returns:
+            True if the snapshot was loaded completely
+        """
+        by_dir = self._fetch()
+        if by_dir is None:
+            return False
+        self._replace(by_dir)
+        return True
+    
+    def reload_changes(self) -> Optional[List[str]]:
+        """Fetch the library again and compare it with the current snapshot
+        
+        Returns:
+            Folders whose movie was added, re-added or had its genres or
+            date changed, or None if the library could not be read
+        """
+        by_dir = self._fetch()
+        if by_dir is None:
+            return None
+        
+        with self.lock:
+            old = self.by_dir
+        changed = []
+        for directory, movie in by_dir.items():
+            previous = old.get(directory)
+            if (previous is None or previous.movie_id != movie.movie_id
+                    or previous.dateadded != movie.dateadded
+                    or set(previous.genres) != set(movie.genres)):
+                changed.append(directory)
+        
+        self._replace(by_dir)
+        return changed
+    
+    def get(self, path: str) -> Optional[MovieEntry]:
+        """Get the movie stored in a folder"""
+        with self.lock:
+            return self.by_dir.get(self.normalize_dir(path))
+    
+    def get_dir(self, movie_id: int) -> Optional[str]:
+        """Get the folder of a movie by its library ID"""
+        with self.lock:
+            return self.by_id.get(movie_id)
+    
+    def remove(self, path: str):
+        """Drop a folder's movie, e.g. after it was removed from the library"""
+        with self.lock:
+            movie = self.by_dir.pop(self.normalize_dir(path), None)
+            if movie is not None:
+                self.by_id.pop(movie.movie_id, None)
+    
+    def remove_id(self, movie_id: int):
+        """Drop a movie by its library ID"""
+        with self.lock:
+            directory = self.by_id.pop(movie_id, None)
+            if directory is not None:
+                self.by_dir.pop(directory, None)
+    
+    def set(self, path: str, movie: MovieEntry):
+        """Add or replace the movie of a folder"""
+        with self.lock:
+            directory = self.normalize_dir(path)
+            self.by_dir[directory] = movie
+            self.by_id[movie.movie_id] = directory
+    
+    def count(self) -> int:
+        """Get number of indexed movies"""
+        with self.lock:
+            return len(self.by_dir)
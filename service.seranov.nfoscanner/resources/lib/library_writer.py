@@ -0,0 +1,187 @@
+"""Library Writer - Coalesced queue of JSON-RPC changes to the Kodi library"""
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import xbmc
+
+
+class LibraryWriteQueue:
+    """Collects library changes and sends them as JSON-RPC batches
+    
+    Genre updates are coalesced per movie, so a movie touched several times
+    during a pass is written once. Removals and genre updates are sent as
+    JSON-RPC batch arrays. Directory scans are merged: when most folders of
+    a parent are queued they become one scan of the parent, as long as the
+    parent lies inside their video source, and scans are sent at most once
+    per ``scan_interval`` seconds.
+    """
+    
+    # Maximum number of calls in one JSON-RPC batch
+    BATCH_SIZE = 50
+    
+    # Number of queued movie changes that triggers a flush during a pass
+    FLUSH_SIZE = 100
+    
+    # Folders with the same parent needed to scan the parent instead
+    MERGE_THRESHOLD = 3
+    
+    # Share of the parent's subfolders that has to be queued for a merge
+    MERGE_RATIO = 0.5
+    
+    def __init__(self, log: Callable[[str, int], None], scan_interval: int = 30, metrics=None):
+        """
+        Initialize the write queue
+        
+        Args:
+            log: Callable taking a message and an xbmc log level
+            scan_interval: Minimum seconds between VideoLibrary.Scan requests
+            metrics: Optional ScanMetrics counting the sent calls
+        """
+        self.log = log
+        self.metrics = metrics
+        self.scan_interval = scan_interval
+        self.lock = threading.Lock()
+        self.genres: Dict[int, Set[str]] = {}  # movie id -> complete genre list
+        self.removals: Set[int] = set()
+        self.scans: Dict[str, Tuple[Optional[str], int]] = {}  # path -> (source root, subfolders of the parent)
+        self.last_scan = 0
+    
+    def set_genres(self, movie_id: int, genres: Set[str]):
+        """Queue a genre update for a movie"""
+        with self.lock:
+            if movie_id in self.removals:
+                return
+            self.genres.setdefault(movie_id, set()).update(genres)
+    
+    def remove_movie(self, movie_id: int):
+        """Queue removal of a movie from the library"""
+        with self.lock:
+            self.genres.pop(movie_id, None)
+            self.removals.add(movie_id)
+    
+    def scan_directory(self, path: str, root: Optional[str] = None, siblings: int = 0):
+        """Queue a library scan of a folder
+        
+        Args:
+            path: Folder to scan
+            root: Video source containing the folder, scans are never merged above it
+            siblings: Number of subfolders of the folder's parent, 0 if unknown (never merged)
+        """
+        with self.lock:
+            self.scans[path] = (root, siblings)
+    
+    def pending(self) -> int:
+        """Get number of queued changes"""
+        with self.lock:
+            return len(self.genres) + len(self.removals) + len(self.scans)
+    
+    def maybe_flush(self):
+        """Send queued movie changes once enough of them were collected"""
+        with self.lock:
+            full = len(self.genres) + len(self.removals) >= self.FLUSH_SIZE
+        if full:
+            self.flush()
+    
+    def flush(self, force: bool = False):
+        """Send queued changes
+        
+        Args:
+            force: Also send scans held back by the rate limit, used on
+                shutdown so removed movies are scanned back in
+        """
+        with self.lock:
+            calls = [
+                ('VideoLibrary.RemoveMovie', {"movieid": movie_id})
+                for movie_id in sorted(self.removals)
+            ]
+            calls += [
+                ('VideoLibrary.SetMovieDetails', {"movieid": movie_id, "genre": sorted(genres)})
+                for movie_id, genres in self.genres.items()
+            ]
+            self.removals = set()
+            self.genres = {}
+            
+            scans = []
+            if self.scans and (force or time.time() - self.last_scan >= self.scan_interval):
+                scans = self.merge_scan_dirs(self.scans)
+                self.scans = {}
+                self.last_scan = time.time()
+        
+        # Removals go first so re-imported movies are added again by the scans
+        for start in range(0, len(calls), self.BATCH_SIZE):
+            self._send_batch(calls[start:start + self.BATCH_SIZE])
+        if scans:
+            self._send_batch([
+                ('VideoLibrary.Scan', {"directory": path, "showdialogs": False})
+                for path in scans
+            ])
+    
+    def _send_batch(self, calls: List[tuple]):
+        """Send a JSON-RPC batch request and log failed calls"""
+        if not calls:
+            return
+        request = json.dumps([
+            {"jsonrpc": "2.0", "method": method, "params": params, "id": index}
+            for index, (method, params) in enumerate(calls)
+        ])
+        try:
+            if self.metrics:
+                with self.metrics.jsonrpc([method for method, _ in calls]):
+                    response = xbmc.executeJSONRPC(request)
+            else:
+                response = xbmc.executeJSONRPC(request)
+            responses = json.loads(response)
+            if isinstance(responses, dict):
+                responses = [responses]
+            for response in responses:
+                if 'error' in response:
+                    index = response.get('id')
+                    method = calls[index][0] if isinstance(index, int) and index < len(calls) else 'unknown'
+                    self.log(f'{method} failed: {response["error"]}', xbmc.LOGWARNING)
+            self.log(f'Sent {len(calls)} library changes', xbmc.LOGDEBUG)
+        except Exception as e:
+            self.log(f'Error sending library changes: {e}', xbmc.LOGERROR)
+    
+    @staticmethod
+    def is_below(path: str, root: str) -> bool:
+        """Check if a path lies strictly inside a folder"""
+        base = root.rstrip('/\\')
+        return path.rstrip('/\\') != base and path.startswith((base + '/', base + '\\'))
+    
+    @classmethod
+    def merge_scan_dirs(cls, scans: Dict[str, Tuple[Optional[str], int]]) -> List[str]:
+        """Merge folders to scan into as few scans as possible
+        
+        Folders below another queued folder are dropped. Folders sharing a
+        parent are replaced by one scan of that parent once at least
+        MERGE_THRESHOLD of them and MERGE_RATIO of the parent's subfolders
+        are queued, unless the parent is their source root or above it,
+        which could mean scanning a whole source or a folder Kodi has no
+        content set for.
+        
+        Args:
+            scans: Folder -> (source root, number of subfolders of its parent)
+        """
+        by_parent: Dict[str, List[str]] = {}
+        for path in scans:
+            by_parent.setdefault(os.path.dirname(path.rstrip('/\\')), []).append(path)
+        
+        merged = set()
+        for parent, children in by_parent.items():
+            roots = {scans[child][0] for child in children}
+            siblings = max(scans[child][1] for child in children)
+            root = roots.pop() if len(roots) == 1 else None
+            if (parent and root and cls.is_below(parent, root)
+                    and len(children) >= cls.MERGE_THRESHOLD
+                    and siblings and len(children) >= siblings * cls.MERGE_RATIO):
+                merged.add(parent)
+            else:
+                merged.update(children)
+        
+        result = []
+        for path in sorted(merged, key=len):
+            if not any(cls.is_below(path, kept) for kept in result):
+                result.append(path)
+        return result
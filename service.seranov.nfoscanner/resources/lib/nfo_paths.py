@@ -0,0 +1,10 @@
+"""NFO Paths - File names and path checks shared by the scanner modules"""
+
+# NFO files read by the scanner
+MOVIE_NFO = 'movie.nfo'
+CATEGORY_NFO = 'category.nfo'
+
+
+def is_local(path: str) -> bool:
+    """Check if a path is on a local or mounted file system (not a VFS URL)"""
+    return '://' not in path
@@ -1,44 +1,174 @@
 """NFO Scanner - Scans video folders for movie.nfo and category.nfo files"""
 import os
+import sys
 import time
 import threading
 import json
+import hashlib
+import io
 import xml.etree.ElementTree as ET
-from datetime import datetime
-from typing import Dict, List, Set, Optional, Tuple
+from typing import Dict, FrozenSet, List, Set, Optional, Tuple
 import xbmc
 import xbmcvfs
 
+from .dir_listing import list_local
+from .fs_watcher import InotifyWatcher
+from .library_snapshot import LibrarySnapshot, MovieEntry
+from .library_writer import LibraryWriteQueue
+from .nfo_paths import CATEGORY_NFO, MOVIE_NFO, is_local
 from .plugin_log import PluginLog
+from .scan_index import FolderEntry, ScanIndex
+from .scan_metrics import ScanMetrics
+from .scan_pool import ScanWorkerPool
+from .scan_scheduler import PRIORITY_BACKGROUND, PRIORITY_BROWSING, PRIORITY_RECENT, ScanScheduler, ScanTask
+
+
+# Canonical genre sets shared by all folder nodes and scan tasks
+_genre_sets: Dict[FrozenSet[str], FrozenSet[str]] = {}
+_genre_sets_lock = threading.Lock()
+
+
+def intern_genres(genres) -> FrozenSet[str]:
+    """Get the shared instance of a genre set"""
+    genres = frozenset(genres)
+    with _genre_sets_lock:
+        return _genre_sets.setdefault(genres, genres)
 
 
 class FolderNode:
-    """Represents a folder in the scanning tree"""
-    def __init__(self, path: str, parent=None):
-        self.path = path
+    """Represents a folder in the scanning tree
+    
+    Nodes only store their own path segment; the root node's name is the
+    source path. A node removes itself from its parent once it and all its
+    subfolders have been scanned, so the tree only holds folders that are
+    still waiting to be scanned and their parents. The scan index keeps
+    the persistent state of everything else.
+    """
+    __slots__ = ('name', 'parent', 'children', 'scanned', 'mtime', 'genres')
+    
+    # Tree structure changes come from worker threads and event handlers
+    lock = threading.RLock()
+    live_count = 0
+    
+    def __init__(self, name: str, parent=None):
+        self.name = sys.intern(name)
         self.parent = parent
-        self.children = {}
+        self.children = None  # name -> FolderNode, created on demand
         self.scanned = False
         self.mtime = 0
-        self.genres = set()  # Genres from category.nfo
-        
+        self.genres = intern_genres(())  # Genres from category.nfo
+        with FolderNode.lock:
+            FolderNode.live_count += 1
+    
+    @property
+    def path(self) -> str:
+        """Full path of the folder"""
+        names = []
+        node = self
+        while node is not None:
+            names.append(node.name)
+            node = node.parent
+        return os.path.join(*reversed(names))
+    
     def add_child(self, name: str):
         """Add a child folder"""
-        if name not in self.children:
-            self.children[name] = FolderNode(os.path.join(self.path, name), self)
-        return self.children[name]
+        with FolderNode.lock:
+            if self.children is None:
+                self.children = {}
+            child = self.children.get(name)
+            if child is None:
+                child = FolderNode(name, self)
+                self.children[child.name] = child
+            return child
+    
+    def retain_children(self, names):
+        """Drop child folders that no longer exist"""
+        with FolderNode.lock:
+            if not self.children:
+                return
+            keep = set(names)
+            for name in [name for name in self.children if name not in keep]:
+                FolderNode._release(self.children.pop(name))
+    
+    def drop_children(self):
+        """Drop all child folders"""
+        with FolderNode.lock:
+            if self.children:
+                for child in self.children.values():
+                    FolderNode._release(child)
+            self.children = None
+    
+    @staticmethod
+    def _release(node):
+        """Update the node count for a detached subtree (caller holds the lock)"""
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            FolderNode.live_count = max(0, FolderNode.live_count - 1)
+            if current.children:
+                stack.extend(current.children.values())
     
     def mark_scanned(self):
-        """Mark this folder as scanned"""
-        self.scanned = True
-        # If all children are scanned, we can compress memory by clearing children
-        if self.children and all(child.scanned for child in self.children.values()):
-            self.children.clear()
+        """Mark this folder as scanned
+        
+        Fully scanned subtrees are detached from their parents to free memory.
+        """
+        with FolderNode.lock:
+            self.scanned = True
+            node = self
+            while node.scanned and not node.children and node.parent is not None:
+                parent = node.parent
+                if parent.children and parent.children.get(node.name) is node:
+                    del parent.children[node.name]
+                    FolderNode.live_count = max(0, FolderNode.live_count - 1)
+                node = parent
+    
+    @classmethod
+    def reset_count(cls):
+        """Forget all counted nodes, e.g. after the tree was cleared"""
+        with cls.lock:
+            cls.live_count = 0
+    
+    @staticmethod
+    def footprint(roots) -> Tuple[int, int]:
+        """Measure the tree size
+        
+        Returns:
+            Tuple of (node count, approximate bytes used)
+        """
+        count = 0
+        size = 0
+        with FolderNode.lock:
+            stack = list(roots)
+            while stack:
+                node = stack.pop()
+                count += 1
+                size += sys.getsizeof(node) + sys.getsizeof(node.name)
+                if node.children:
+                    size += sys.getsizeof(node.children)
+                    stack.extend(node.children.values())
+        return count, size
 
 
 class NFOScanner:
     """Main NFO scanner class"""
     
+    # Folders modified within this many seconds are scanned before the rest
+    RECENT_WINDOW = 24 * 60 * 60
+    
+    # Maximum age of the library snapshot used for priority scans (seconds)
+    SNAPSHOT_MAX_AGE = 5 * 60
+    
+    # A folder re-imported less than this many seconds ago is not re-imported again,
+    # so the library events caused by a re-import can't start another one
+    REIMPORT_COOLDOWN = 60 * 60
+    
+    # Rough size of one folder node with its name and children dict (bytes)
+    NODE_BYTES = 240
+    
+    # Above this many updated movies the library is re-read instead of queried per movie
+    MAX_SINGLE_UPDATES = 50
+    
     def __init__(self, addon, monitor):
         self.addon = addon
         self.monitor = monitor
@@ -50,9 +180,30 @@ class NFOScanner:
         # Initialize plugin logger
         self.plugin_log = PluginLog(addon)
         
+        self.metrics = ScanMetrics(addon)  # Counters and timings, saved to scan_stats.json
+        
+        # Kodi library snapshot, refreshed once per scan pass
+        self.library = LibrarySnapshot(self.metrics)
+        
         # Folder tracking
         self.folder_tree = {}  # root path -> FolderNode
-        self.priority_queue = []  # List of folders to scan with priority
+        self.index = ScanIndex(addon)  # Persistent folder state
+        self.pass_id = 0  # ID of the running full pass, 0 outside of passes
+        self.pass_failures = 0  # Folders the running pass failed to scan
+        self.failures_lock = threading.Lock()
+        self.scheduler = ScanScheduler()  # Folders waiting to be scanned, by priority
+        self.reimported = {}  # path -> time of the last re-import
+        # Pending library changes
+        self.writer = LibraryWriteQueue(lambda msg, level: self.log(msg, level, component='writer'),
+                                        metrics=self.metrics)
+        
+        # Library and file system events, handled by the scanner thread
+        self.events_lock = threading.Lock()
+        self.library_scanning = False
+        self.library_scan_finished = False
+        self.updated_movies = set()
+        self.queued_folders = []  # (path, priority, depth) waiting to be resolved
+        self.watcher = None
         
         # Settings
         self.scan_interval = 60  # minutes
@@ -60,20 +211,25 @@ class NFOScanner:
         self.pause_on_playback = True
         self.debug_logging = False
         self.scan_network_sources = True
+        self.prune_unchanged = False
+        self.event_driven = True
+        self.sweep_interval = 24  # hours
+        self.watch_local_sources = False
+        self.tree_memory_mb = 16
         
         self.load_settings()
     
-    def log(self, msg: str, level=xbmc.LOGINFO):
-        """Log message"""
+    def log(self, msg: str, level=xbmc.LOGINFO, path: Optional[str] = None, component: Optional[str] = None):
+        """Log message, optionally about a folder"""
         # Map xbmc log levels to plugin log levels
         if level == xbmc.LOGDEBUG:
-            self.plugin_log.debug(msg)
+            self.plugin_log.debug(msg, component=component, path=path)
         elif level == xbmc.LOGWARNING:
-            self.plugin_log.warning(msg)
+            self.plugin_log.warning(msg, component=component, path=path)
         elif level == xbmc.LOGERROR:
-            self.plugin_log.error(msg)
+            self.plugin_log.error(msg, component=component, path=path)
         else:
-            self.plugin_log.info(msg)
+            self.plugin_log.info(msg, component=component, path=path)
     
     def load_settings(self):
         """Load settings from addon configuration"""
@@ -83,11 +239,24 @@ class NFOScanner:
             self.pause_on_playback = self.addon.getSetting('pause_on_playback') == 'true'
             self.debug_logging = self.addon.getSetting('debug_logging') == 'true'
             self.scan_network_sources = self.addon.getSetting('scan_network_sources') == 'true'
+            self.prune_unchanged = self.addon.getSetting('prune_unchanged') == 'true'
+            self.event_driven = self.addon.getSetting('event_driven') == 'true'
+            self.sweep_interval = int(self.addon.getSetting('sweep_interval') or 24)
+            self.watch_local_sources = self.addon.getSetting('watch_local_sources') == 'true'
+            self.tree_memory_mb = int(self.addon.getSetting('tree_memory_mb') or 16)
+            self.writer.scan_interval = int(self.addon.getSetting('library_scan_interval') or 30)
             
-            # Update plugin log debug setting
+            # Update plugin log debug and format settings
             self.plugin_log.set_debug_enabled(self.debug_logging)
+            self.plugin_log.set_structured(self.addon.getSetting('structured_log') == 'true')
+            
+            if self.running:
+                self.update_watcher()
             
-            self.log(f'Settings loaded: interval={self.scan_interval}min, threads={self.thread_count}')
+            if self.event_driven:
+                self.log(f'Settings loaded: event-driven, sweep={self.sweep_interval}h, threads={self.thread_count}')
+            else:
+                self.log(f'Settings loaded: interval={self.scan_interval}min, threads={self.thread_count}')
         except Exception as e:
             self.log(f'Error loading settings: {e}', xbmc.LOGERROR)
     
@@ -101,7 +270,8 @@ class NFOScanner:
                 "params": {"media": "video"},
                 "id": 1
             })
-            response = xbmc.executeJSONRPC(request)
+            with self.metrics.jsonrpc(['Files.GetSources']):
+                response = xbmc.executeJSONRPC(request)
             result = json.loads(response)
             
             sources = []
@@ -126,11 +296,47 @@ class NFOScanner:
     def get_folder_mtime(self, path: str) -> float:
         """Get folder modification time"""
         try:
-            stat = xbmcvfs.Stat(path)
-            return stat.st_mtime()
+            with self.metrics.timed('stat'):
+                stat = xbmcvfs.Stat(path)
+                return stat.st_mtime()
         except:
             return 0
     
+    def read_nfo(self, nfo_path: str) -> Optional[bytes]:
+        """Read raw content of an NFO file, None if it can't be read"""
+        try:
+            with self.metrics.timed('read'):
+                file_obj = xbmcvfs.File(nfo_path, 'r')
+                try:
+                    content = bytes(file_obj.readBytes())
+                finally:
+                    file_obj.close()
+            self.metrics.count('bytes_read', len(content))
+            return content
+        except Exception as e:
+            self.log(f'Error reading {nfo_path}: {e}', xbmc.LOGDEBUG)
+            return None
+    
+    def hash_nfo(self, content: bytes) -> str:
+        """Get content hash of an NFO file"""
+        self.metrics.count('nfo_hashed')
+        return hashlib.sha1(content).hexdigest()
+    
+    def parse_category_genres(self, content: bytes) -> Set[str]:
+        """Collect <genre> values from category.nfo content
+        
+        Streams the document and drops every element once it's handled
+        instead of building the whole tree.
+        """
+        genres = set()
+        with self.metrics.timed('parse'):
+            for _, elem in ET.iterparse(io.BytesIO(content), events=('end',)):
+                if elem.tag == 'genre' and elem.text:
+                    genres.add(elem.text.strip())
+                elem.clear()
+        self.metrics.count('nfo_parsed')
+        return genres
+    
     def read_category_nfo(self, path: str) -> Set[str]:
         """Read genres from category.nfo file"""
         genres = set()
@@ -138,19 +344,13 @@ class NFOScanner:
         
         try:
             if xbmcvfs.exists(category_path):
-                file_obj = xbmcvfs.File(category_path, 'r')
-                content = file_obj.read()
-                file_obj.close()
-                
-                # Parse XML
-                root = ET.fromstring(content)
-                for genre_elem in root.findall('.//genre'):
-                    if genre_elem.text:
-                        genres.add(genre_elem.text.strip())
+                content = self.read_nfo(category_path)
+                if content:
+                    genres = self.parse_category_genres(content)
                 
                 self.log(f'Found genres in {category_path}: {genres}', xbmc.LOGDEBUG)
         except Exception as e:
-            self.log(f'Error reading category.nfo from {path}: {e}', xbmc.LOGDEBUG)
+            self.log(f'Error reading category.nfo from {path}: {e}', xbmc.LOGDEBUG, path=path)
         
         return genres
     
@@ -158,213 +358,330 @@ class NFOScanner:
         """Get modification time of movie.nfo file"""
         nfo_path = os.path.join(path, 'movie.nfo')
         try:
-            if xbmcvfs.exists(nfo_path):
-                stat = xbmcvfs.Stat(nfo_path)
-                return stat.st_mtime()
+            with self.metrics.timed('stat'):
+                if xbmcvfs.exists(nfo_path):
+                    stat = xbmcvfs.Stat(nfo_path)
+                    return stat.st_mtime()
         except Exception:
             pass
         return 0
     
-    def get_kodi_movie_date(self, path: str) -> float:
-        """Get movie date from Kodi database via JSON-RPC"""
+    def get_category_nfo_mtime(self, path: str) -> float:
+        """Get modification time of category.nfo file"""
+        nfo_path = os.path.join(path, 'category.nfo')
         try:
-            # Query for movie by path
-            request = json.dumps({
-                "jsonrpc": "2.0",
-                "method": "VideoLibrary.GetMovies",
-                "params": {
-                    "properties": ["file", "dateadded", "lastplayed"],
-                    "filter": {
-                        "field": "path",
-                        "operator": "contains",
-                        "value": path
-                    }
-                },
-                "id": 1
-            })
-            response = xbmc.executeJSONRPC(request)
-            result = json.loads(response)
-            
-            if 'result' in result and 'movies' in result['result'] and result['result']['movies']:
-                movie = result['result']['movies'][0]
-                # Parse dateadded to timestamp
-                date_str = movie.get('dateadded', '')
-                if date_str:
-                    # Convert ISO format to timestamp
-                    dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                    return dt.timestamp()
-        except Exception as e:
-            self.log(f'Error getting movie date from Kodi DB: {e}', xbmc.LOGDEBUG)
-        
+            with self.metrics.timed('stat'):
+                if xbmcvfs.exists(nfo_path):
+                    stat = xbmcvfs.Stat(nfo_path)
+                    return stat.st_mtime()
+        except Exception:
+            pass
         return 0
     
+    def get_kodi_movie_date(self, path: str) -> float:
+        """Get movie date from the library snapshot"""
+        movie = self.library.get(path)
+        return movie.dateadded if movie else 0
+    
     def reimport_movie(self, path: str, genres: Set[str]) -> bool:
-        """Re-import movie.nfo into Kodi database"""
+        """Queue a re-import of movie.nfo into Kodi database"""
         try:
-            self.log(f'Re-importing movie from: {path}', xbmc.LOGINFO)
+            self.log(f'Re-importing movie from: {path}', xbmc.LOGINFO, path=path)
             
             # Remove existing movie from library
             movie_id = self.get_movie_id_by_path(path)
             if movie_id is not None:
-                request = json.dumps({
-                    "jsonrpc": "2.0",
-                    "method": "VideoLibrary.RemoveMovie",
-                    "params": {
-                        "movieid": movie_id
-                    },
-                    "id": 1
-                })
-                xbmc.executeJSONRPC(request)
+                self.writer.remove_movie(movie_id)
+                # The movie gets a new ID once Kodi re-adds it, so genres
+                # from category.nfo are merged on the next pass
+                self.library.remove(path)
             
-            # Trigger scan of specific directory
-            request = json.dumps({
-                "jsonrpc": "2.0",
-                "method": "VideoLibrary.Scan",
-                "params": {
-                    "directory": path,
-                    "showdialogs": False
-                },
-                "id": 1
-            })
-            response = xbmc.executeJSONRPC(request)
-            result = json.loads(response)
-            
-            # If we have additional genres from category.nfo, add them
-            if genres:
-                self.add_genres_to_movie(path, genres)
+            # Scan of the directory is merged with other pending scans
+            parent = self.index.get(os.path.dirname(path.rstrip('/\\')))
+            self.writer.scan_directory(path, self.find_source_root(path),
+                                       len(parent.subdirs) if parent is not None else 0)
             
-            self.log(f'Successfully re-imported: {path}', xbmc.LOGDEBUG)
-            return 'result' in result
+            self.log(f'Queued re-import: {path}', xbmc.LOGDEBUG, path=path)
+            return True
         except Exception as e:
-            self.log(f'Error re-importing movie from {path}: {e}', xbmc.LOGERROR)
+            self.log(f'Error re-importing movie from {path}: {e}', xbmc.LOGERROR, path=path)
             return False
     
     def get_movie_id_by_path(self, path: str) -> Optional[int]:
-        """Get movie ID from Kodi database by path"""
-        try:
-            request = json.dumps({
-                "jsonrpc": "2.0",
-                "method": "VideoLibrary.GetMovies",
-                "params": {
-                    "properties": ["file"],
-                    "filter": {
-                        "field": "path",
-                        "operator": "contains",
-                        "value": path
-                    }
-                },
-                "id": 1
-            })
-            response = xbmc.executeJSONRPC(request)
-            result = json.loads(response)
-            
-            if 'result' in result and 'movies' in result['result'] and result['result']['movies']:
-                return result['result']['movies'][0].get('movieid')
-        except Exception as e:
-            self.log(f'Error getting movie ID: {e}', xbmc.LOGDEBUG)
-        
-        return None
+        """Get movie ID from the library snapshot by path"""
+        movie = self.library.get(path)
+        return movie.movie_id if movie else None
     
     def add_genres_to_movie(self, path: str, genres: Set[str]):
-        """Add genres from category.nfo to movie in Kodi database"""
+        """Queue genres from category.nfo to be added to a movie in Kodi database"""
         try:
-            movie_id = self.get_movie_id_by_path(path)
-            if not movie_id:
+            movie = self.library.get(path)
+            if not movie or not movie.movie_id:
                 return
             
-            # Get current genres
-            request = json.dumps({
-                "jsonrpc": "2.0",
-                "method": "VideoLibrary.GetMovieDetails",
-                "params": {
-                    "movieid": movie_id,
-                    "properties": ["genre"]
-                },
-                "id": 1
-            })
-            response = xbmc.executeJSONRPC(request)
-            result = json.loads(response)
-            
-            current_genres = set()
-            if 'result' in result and 'moviedetails' in result['result']:
-                current_genres = set(result['result']['moviedetails'].get('genre', []))
+            current_genres = set(movie.genres)
+            if genres <= current_genres:
+                # Nothing to add; writing anyway would trigger another OnUpdate
+                return
             
-            # Merge genres
+            # Merge genres with the ones already stored in the library
             all_genres = current_genres | genres
+            self.writer.set_genres(movie.movie_id, all_genres)
+            self.metrics.count('genre_updates')
+            movie.genres = sorted(all_genres)
             
-            # Update movie with new genres
-            request = json.dumps({
-                "jsonrpc": "2.0",
-                "method": "VideoLibrary.SetMovieDetails",
-                "params": {
-                    "movieid": movie_id,
-                    "genre": list(all_genres)
-                },
-                "id": 1
-            })
-            xbmc.executeJSONRPC(request)
-            
-            self.log(f'Added genres {genres} to movie at {path}', xbmc.LOGDEBUG)
+            self.log(f'Added genres {genres} to movie at {path}', xbmc.LOGDEBUG, path=path)
         except Exception as e:
             self.log(f'Error adding genres to movie: {e}', xbmc.LOGDEBUG)
     
-    def scan_folder(self, path: str, parent_genres: Set[str] = None) -> int:
-        """Scan a folder for movie.nfo and category.nfo files"""
-        if not self.running or self.monitor.abortRequested():
-            return 0
+    def should_stop(self) -> bool:
+        """Check if scanning must stop"""
+        return not self.running or self.monitor.abortRequested()
+    
+    def wait_if_paused(self) -> bool:
+        """Block while the scanner is paused
         
-        # Wait if paused
+        Returns:
+            False if the scanner was stopped or Kodi is shutting down
+        """
         while self.paused and self.running:
             if self.monitor.waitForAbort(1):
-                return 0
+                return False
+        return not self.should_stop()
+    
+    def scan_folder(self, task: ScanTask) -> Tuple[int, List[ScanTask]]:
+        """Scan a single folder for movie.nfo and category.nfo files
+        
+        Args:
+            task: Scan task with the folder's tree node (mtime already filled in)
+                and the genres inherited from category.nfo files of parent folders
         
+        Returns:
+            Tuple of (re-imported count, subfolder tasks for the scheduler)
+        """
+        node = task.node
+        parent_genres = task.parent_genres
+        path = node.path
         scanned_count = 0
+        subfolders = []
         
+        self.metrics.count('folders_visited')
         try:
-            # Read category.nfo from current folder
-            current_genres = self.read_category_nfo(path)
+            with self.metrics.timed('index'):
+                entry = self.index.get(path)
+            # Nothing was added, removed or renamed directly in this folder
+            unchanged = entry is not None and node.mtime > 0 and entry.mtime == node.mtime
+            
+            # Folders on screen are always checked, even if pruning is enabled
+            if (unchanged and self.prune_unchanged and task.priority != PRIORITY_BROWSING
+                    and self.index.is_complete(entry)
+                    and entry.genres == parent_genres | entry.own_genres):
+                self.log(f'Folder unchanged, skipping branch: {path}', xbmc.LOGDEBUG, path=path)
+                self.metrics.count('folders_skipped')
+                if self.watcher:
+                    self.watch_pruned(path, entry)
+                node.genres = intern_genres(entry.own_genres)
+                node.drop_children()
+                return 0, []
+            
+            # Local folders are listed in one pass that also finds the NFO files
+            listing = None
+            if is_local(path):
+                try:
+                    with self.metrics.timed('scandir'):
+                        listing = list_local(path, (MOVIE_NFO, CATEGORY_NFO))
+                except OSError as e:
+                    self.log(f'Error listing {path} directly, using VFS: {e}', xbmc.LOGDEBUG, path=path)
+            
+            # Read category.nfo only if it was added or modified
+            if listing is not None:
+                category_mtime = listing.files.get(CATEGORY_NFO, 0)
+            elif unchanged and not entry.category_nfo_mtime:
+                category_mtime = 0
+            else:
+                category_mtime = self.get_category_nfo_mtime(path)
+            category_hash = ''
+            if category_mtime == 0:
+                current_genres = frozenset()
+            elif entry is not None and category_mtime == entry.category_nfo_mtime:
+                current_genres = entry.own_genres
+                category_hash = entry.category_nfo_hash
+            else:
+                content = self.read_nfo(os.path.join(path, CATEGORY_NFO))
+                category_hash = self.hash_nfo(content) if content is not None else ''
+                if entry is not None and category_hash and category_hash == entry.category_nfo_hash:
+                    # Touched or copied, but the content is the same
+                    current_genres = entry.own_genres
+                else:
+                    try:
+                        current_genres = frozenset(self.parse_category_genres(content)) if content else frozenset()
+                    except Exception as e:
+                        self.log(f'Error reading category.nfo from {path}: {e}', xbmc.LOGDEBUG, path=path)
+                        current_genres = frozenset()
+                    self.log(f'Found genres in {path}: {set(current_genres)}', xbmc.LOGDEBUG, path=path)
             # Merge with parent genres
-            all_genres = (parent_genres or set()) | current_genres
+            all_genres = intern_genres(parent_genres | current_genres)
             
             # Check if movie.nfo exists
-            nfo_mtime = self.get_movie_nfo_mtime(path)
+            if listing is not None:
+                nfo_mtime = listing.files.get(MOVIE_NFO, 0)
+            elif unchanged and not entry.movie_nfo_mtime:
+                nfo_mtime = 0
+            else:
+                nfo_mtime = self.get_movie_nfo_mtime(path)
+            nfo_hash = entry.movie_nfo_hash if entry is not None and nfo_mtime == entry.movie_nfo_mtime else ''
             if nfo_mtime > 0:
-                # Check if we need to re-import
+                if not nfo_hash:
+                    # New or modified file, hash its content
+                    content = self.read_nfo(os.path.join(path, MOVIE_NFO))
+                    nfo_hash = self.hash_nfo(content) if content is not None else ''
+                content_changed = entry is None or not nfo_hash or nfo_hash != entry.movie_nfo_hash
+                
+                # Check if we need to re-import; a movie missing from the library
+                # (e.g. a re-import that didn't come back) is imported whatever the hash
                 kodi_date = self.get_kodi_movie_date(path)
-                if nfo_mtime > kodi_date:
-                    self.log(f'NFO newer than DB for {path}, re-importing', xbmc.LOGINFO)
-                    if self.reimport_movie(path, all_genres):
-                        scanned_count += 1
+                if nfo_mtime > kodi_date and (content_changed or kodi_date == 0):
+                    if time.time() - self.reimported.get(path, 0) < self.REIMPORT_COOLDOWN:
+                        self.log(f'NFO newer than DB for {path}, but it was re-imported recently',
+                                 xbmc.LOGDEBUG, path=path)
+                        # Not imported yet, compare against an unknown hash next time
+                        nfo_hash = ''
+                    else:
+                        self.log(f'NFO newer than DB for {path}, re-importing', xbmc.LOGINFO, path=path)
+                        if self.reimport_movie(path, all_genres):
+                            self.reimported[path] = time.time()
+                            self.metrics.count('movies_reimported')
+                            scanned_count += 1
+                        # Only queued so far, the hash is stored once the movie is back
+                        nfo_hash = ''
                 elif all_genres and kodi_date > 0:
-                    # Even if NFO is not newer, add genres from category.nfo
+                    # NFO is not newer or only its mtime changed (copy, restore, touch),
+                    # still add genres from category.nfo
                     self.add_genres_to_movie(path, all_genres)
             
-            # Scan subdirectories
+            if self.watcher:
+                self.watcher.watch(path)
+            
+            # Collect subdirectories for the worker pool
             try:
-                dirs, files = xbmcvfs.listdir(path)
+                if listing is not None:
+                    dirs = list(listing.dirs)
+                elif unchanged:
+                    # Folder listing can't have changed, reuse the stored one
+                    dirs = entry.subdirs
+                else:
+                    with self.metrics.timed('listdir'):
+                        dirs, files = xbmcvfs.listdir(path)
+                if entry is not None and not unchanged:
+                    for removed in set(entry.subdirs) - set(dirs):
+                        self.index.remove_tree(os.path.join(path, removed))
+                node.retain_children(dirs)
                 
                 # Sort directories by modification time (newest first)
-                dir_times = []
-                for dir_name in dirs:
-                    dir_path = os.path.join(path, dir_name)
-                    mtime = self.get_folder_mtime(dir_path)
-                    dir_times.append((mtime, dir_path))
+                if listing is not None:
+                    dir_times = [(mtime, dir_name) for dir_name, mtime in listing.dirs.items()]
+                else:
+                    dir_times = []
+                    for dir_name in dirs:
+                        mtime = self.get_folder_mtime(os.path.join(path, dir_name))
+                        dir_times.append((mtime, dir_name))
                 
                 dir_times.sort(reverse=True)  # Newest first
+                if task.depth != 0:
+                    child_depth = None if task.depth is None else task.depth - 1
+                    recent_since = time.time() - self.RECENT_WINDOW
+                    for mtime, dir_name in dir_times:
+                        child = node.add_child(dir_name)
+                        child.mtime = mtime
+                        child.scanned = False
+                        if task.priority == PRIORITY_BROWSING:
+                            # Subfolders are listed on screen along with the folder
+                            priority = PRIORITY_BROWSING
+                        elif mtime >= recent_since:
+                            priority = PRIORITY_RECENT
+                        else:
+                            priority = PRIORITY_BACKGROUND
+                        subfolders.append(ScanTask(child, all_genres, priority, child_depth, task.level + 1))
+                    self.check_tree_memory()
                 
-                # Recursively scan subdirectories
-                for _, dir_path in dir_times:
-                    if not self.running or self.monitor.abortRequested():
-                        break
-                    scanned_count += self.scan_folder(dir_path, all_genres)
+                # Only a full-depth scan within a pass covers the whole subtree
+                self.index.put(path, FolderEntry(
+                    node.mtime, nfo_mtime, category_mtime,
+                    current_genres, all_genres, list(dirs),
+                    self.pass_id if task.depth is None else 0,
+                    nfo_hash, category_hash
+                ))
                     
             except Exception as e:
-                self.log(f'Error listing directory {path}: {e}', xbmc.LOGDEBUG)
+                self.log(f'Error listing directory {path}: {e}', xbmc.LOGDEBUG, path=path)
+                self.count_failure()
+            
+            node.genres = intern_genres(current_genres)
         
         except Exception as e:
-            self.log(f'Error scanning folder {path}: {e}', xbmc.LOGERROR)
+            self.log(f'Error scanning folder {path}: {e}', xbmc.LOGERROR, path=path)
+            self.count_failure()
+        
+        finally:
+            # Detaches the node (and finished parents) once no subfolder is pending
+            node.mark_scanned()
+            self.writer.maybe_flush()
         
-        return scanned_count
+        return scanned_count, subfolders
+    
+    def watch_pruned(self, path: str, entry: FolderEntry):
+        """Watch a skipped branch, taking its folders from the index
+        
+        Skipped folders aren't visited, so without this a change inside
+        them would go unnoticed until a parent is scanned again. A branch
+        whose top folder is watched already was registered before.
+        """
+        if self.watcher.is_watched(path):
+            return
+        stack = [(path, entry)]
+        while stack and not self.should_stop():
+            folder, folder_entry = stack.pop()
+            self.watcher.watch(folder)
+            for name in folder_entry.subdirs:
+                child = os.path.join(folder, name)
+                child_entry = self.index.get(child)
+                if child_entry is not None:
+                    stack.append((child, child_entry))
+    
+    def count_failure(self):
+        """Count a folder that could not be scanned in the running pass"""
+        with self.failures_lock:
+            self.pass_failures += 1
+    
+    def check_tree_memory(self):
+        """Switch to depth-first scanning while the folder tree exceeds its memory limit"""
+        estimated = FolderNode.live_count * self.NODE_BYTES
+        limit = self.tree_memory_mb * 1024 * 1024
+        if not self.scheduler.depth_first and estimated > limit:
+            self.scheduler.depth_first = True
+            self.log(f'Folder tree above {self.tree_memory_mb} MB, scanning depth-first', xbmc.LOGDEBUG)
+        elif self.scheduler.depth_first and estimated < limit // 2:
+            self.scheduler.depth_first = False
+            self.log('Folder tree below half of its limit, scanning breadth-first', xbmc.LOGDEBUG)
+    
+    def log_tree_footprint(self):
+        """Log the measured size of the folder tree"""
+        with self.lock:
+            roots = list(self.folder_tree.values())
+        count, size = FolderNode.footprint(roots)
+        self.log(f'Folder tree: {count} nodes, {size // 1024} KB '
+                 f'(limit {self.tree_memory_mb} MB), {len(_genre_sets)} genre sets', xbmc.LOGDEBUG)
+    
+    def get_root_node(self, path: str) -> FolderNode:
+        """Get the tree node of a source root folder"""
+        with self.lock:
+            node = self.folder_tree.get(path)
+            if node is None:
+                node = FolderNode(path)
+                self.folder_tree[path] = node
+        node.mtime = self.get_folder_mtime(path)
+        node.scanned = False
+        return node
     
     def scan_all_sources(self):
         """Scan all video sources"""
@@ -374,27 +691,147 @@ class NFOScanner:
                 self.log('No video sources found', xbmc.LOGWARNING)
                 return
             
-            self.log(f'Starting scan of {len(sources)} sources', xbmc.LOGINFO)
+            # Fetch the whole library once instead of querying it per folder
+            with self.metrics.timed('snapshot'):
+                loaded = self.library.load()
+            if not loaded:
+                self.log('Could not load movies from Kodi library, skipping scan', xbmc.LOGERROR)
+                return
+            self.log(f'Library snapshot: {self.library.count()} movies', xbmc.LOGDEBUG)
             
-            total_scanned = 0
+            # Started after the early returns, which would leave the pass open
+            self.metrics.start_pass('full')
+            self.log(f'Starting scan of {len(sources)} sources with {self.thread_count} threads', xbmc.LOGINFO)
             for source in sources:
-                if not self.running or self.monitor.abortRequested():
-                    break
-                
-                path = source['path']
-                label = source['label']
-                self.log(f'Scanning source: {label} ({path})', xbmc.LOGINFO)
-                
-                try:
-                    scanned = self.scan_folder(path)
-                    total_scanned += scanned
-                except Exception as e:
-                    self.log(f'Error scanning source {label}: {e}', xbmc.LOGERROR)
+                self.log(f'Scanning source: {source["label"]} ({source["path"]})', xbmc.LOGINFO)
+            
+            self.index.open()
+            self.pass_id = self.index.begin_pass()
+            self.pass_failures = 0
+            
+            # All sources share the scheduler so no thread idles between sources;
+            # folders queued by user navigation are taken first
+            total_scanned = self.create_pool().run(
+                ScanTask(self.get_root_node(source['path'])) for source in sources
+            )
             
-            self.log(f'Scan completed. Re-imported {total_scanned} items', xbmc.LOGINFO)
+            self.writer.flush()
+            if self.should_stop():
+                # Entries of an interrupted pass must not be used for pruning
+                self.index.commit()
+                self.log(f'Scan interrupted. Re-imported {total_scanned} items', xbmc.LOGINFO)
+            elif self.pass_failures:
+                # Parents got the pass ID before their failed subfolders were scanned
+                self.index.commit()
+                self.log(f'Scan completed with {self.pass_failures} failed folders. '
+                         f'Re-imported {total_scanned} items', xbmc.LOGWARNING)
+            else:
+                self.index.finish_pass(self.pass_id)
+                self.log(f'Scan completed. Re-imported {total_scanned} items', xbmc.LOGINFO)
+            self.pass_id = 0
+            self.metrics.finish_pass('full', interrupted=self.should_stop())
+            self.metrics.save()
+            self.log_tree_footprint()
             
         except Exception as e:
             self.log(f'Error during scan: {e}', xbmc.LOGERROR)
+            self.pass_id = 0
+            self.metrics.finish_pass('full', interrupted=True)
+    
+    def create_pool(self) -> ScanWorkerPool:
+        """Create a worker pool consuming the scanner's scheduler"""
+        return ScanWorkerPool(
+            self.scan_queued_task,
+            self.scheduler,
+            self.thread_count,
+            self.should_stop,
+            self.wait_if_paused,
+            lambda msg: self.log(msg, xbmc.LOGERROR)
+        )
+    
+    def scan_queued_task(self, task: ScanTask) -> Tuple[int, List[ScanTask]]:
+        """Queue folders waiting to be resolved, then scan a folder
+        
+        Lets a running pass take folders the user navigated to first.
+        """
+        self.resolve_queued_folders()
+        return self.scan_folder(task)
+    
+    def scan_priority_folders(self):
+        """Scan folders queued by user navigation outside of a full pass"""
+        try:
+            if time.time() - self.library.loaded_at > self.SNAPSHOT_MAX_AGE:
+                with self.metrics.timed('snapshot'):
+                    loaded = self.library.load()
+                if not loaded:
+                    self.log('Could not load movies from Kodi library', xbmc.LOGERROR)
+                    return
+            
+            self.metrics.start_pass('priority')
+            self.log(f'Scanning {self.scheduler.pending()} priority folders', xbmc.LOGDEBUG)
+            scanned = self.create_pool().run()
+            self.writer.flush()
+            self.index.commit()
+            self.metrics.finish_pass('priority', interrupted=self.should_stop())
+            # Priority passes are frequent, don't rewrite the file after each one
+            self.metrics.save(force=False)
+            if scanned:
+                self.log(f'Priority scan re-imported {scanned} items', xbmc.LOGINFO)
+        except Exception as e:
+            self.log(f'Error during priority scan: {e}', xbmc.LOGERROR)
+            self.metrics.finish_pass('priority', interrupted=True)
+    
+    def find_source_root(self, path: str) -> Optional[str]:
+        """Find the video source containing a path"""
+        roots = list(self.folder_tree.keys())
+        if not roots:
+            roots = [source['path'] for source in self.get_video_sources()]
+        
+        # Prefer the most specific source for nested sources
+        for root in sorted(roots, key=len, reverse=True):
+            base = root.rstrip('/\\')
+            if path.rstrip('/\\') == base or path.startswith((base + '/', base + '\\')):
+                return root
+        return None
+    
+    def get_folder_node(self, root: str, path: str) -> Tuple[FolderNode, int]:
+        """Get or create the tree node of a folder below a source root
+        
+        Returns:
+            Tuple of (node, distance from the source root)
+        """
+        node = self.get_root_node(root)
+        relative = path[len(root.rstrip('/\\')):].replace('\\', '/').strip('/')
+        names = [name for name in relative.split('/') if name]
+        with FolderNode.lock:
+            for name in names:
+                child = node.children.get(name) if node.children else None
+                if child is None:
+                    child = node.add_child(name)
+                    # Only a link to the target folder, so it can be dropped with it
+                    child.scanned = True
+                node = child
+            node.scanned = False
+        node.mtime = self.get_folder_mtime(path)
+        return node, len(names)
+    
+    def resolve_parent_genres(self, root: str, path: str) -> FrozenSet[str]:
+        """Get genres a folder inherits from category.nfo files above it"""
+        root_base = root.rstrip('/\\')
+        current = path.rstrip('/\\')
+        genres = set()
+        while current != root_base:
+            parent = os.path.dirname(current)
+            if not parent or parent == current:
+                break
+            current = parent
+            entry = self.index.get(root if current == root_base else current)
+            if entry is not None:
+                # Stored genres already include everything above this folder
+                genres |= entry.genres
+                break
+            genres |= self.read_category_nfo(current)
+        return frozenset(genres)
     
     def start(self):
         """Start the scanner"""
@@ -404,6 +841,8 @@ class NFOScanner:
                 return
             
             self.running = True
+            self.index.open()
+            self.update_watcher()
             self.scan_thread = threading.Thread(target=self.run_scanner)
             self.scan_thread.daemon = True
             self.scan_thread.start()
@@ -414,11 +853,22 @@ class NFOScanner:
         with self.lock:
             if not self.running:
                 return
-            
             self.running = False
-            if self.scan_thread:
-                self.scan_thread.join(timeout=5)
-            self.log('Scanner stopped', xbmc.LOGINFO)
+            scan_thread = self.scan_thread
+            self.scan_thread = None
+        
+        # Joined without the lock, the scan thread takes it too
+        if scan_thread:
+            scan_thread.join(timeout=5)
+        if self.watcher:
+            self.watcher.stop()
+            self.watcher = None
+        # Scans held back by the rate limit would be lost otherwise
+        self.writer.flush(force=True)
+        self.index.close()
+        self.metrics.save()
+        self.log('Scanner stopped', xbmc.LOGINFO)
+        self.plugin_log.close()
     
     def pause(self):
         """Pause the scanner"""
@@ -434,15 +884,158 @@ class NFOScanner:
         """Clear the scanned folders cache"""
         with self.lock:
             self.folder_tree.clear()
-            self.priority_queue.clear()
+            FolderNode.reset_count()
+            self.scheduler.clear()
+            self.index.clear()
             self.log('Cache cleared', xbmc.LOGINFO)
     
+    def queue_folder(self, path: str, priority: int, depth: Optional[int] = None):
+        """Queue a folder below one of the video sources for scanning
+        
+        Args:
+            path: Folder path
+            priority: One of the PRIORITY_* constants
+            depth: How many subfolder levels to scan, None for the whole subtree
+        """
+        try:
+            path = xbmcvfs.translatePath(path)
+            root = self.find_source_root(path)
+            if root is None:
+                self.log(f'Folder is not in a video source: {path}', xbmc.LOGDEBUG, path=path)
+                return
+            
+            node, level = self.get_folder_node(root, path)
+            parent_genres = self.resolve_parent_genres(root, path)
+            self.scheduler.put(ScanTask(node, parent_genres, priority, depth, level))
+            self.log(f'Queued folder: {path} (priority {priority})', xbmc.LOGDEBUG, path=path)
+        except Exception as e:
+            self.log(f'Error queuing folder {path}: {e}', xbmc.LOGERROR, path=path)
+    
     def add_priority_folder(self, path: str):
-        """Add a folder to the priority queue for immediate scanning"""
-        with self.lock:
-            if path not in self.priority_queue:
-                self.priority_queue.insert(0, path)
-                self.log(f'Added priority folder: {path}', xbmc.LOGDEBUG)
+        """Queue a folder and its subfolders for immediate scanning
+        
+        Called from Kodi's notification thread, so the folder is only
+        resolved later on the scanner thread.
+        """
+        with self.events_lock:
+            self.queued_folders.append((path, PRIORITY_BROWSING, 1))
+    
+    def resolve_queued_folders(self):
+        """Queue folders added by notification and watcher callbacks"""
+        with self.events_lock:
+            if not self.queued_folders:
+                return
+            queued = self.queued_folders
+            self.queued_folders = []
+        for path, priority, depth in queued:
+            self.queue_folder(path, priority, depth)
+    
+    def update_watcher(self):
+        """Start or stop the file system watcher according to settings"""
+        wanted = self.event_driven and self.watch_local_sources
+        if wanted and self.watcher is None:
+            watcher = InotifyWatcher(self.on_folders_changed,
+                                     lambda msg: self.log(msg, xbmc.LOGWARNING, component='watcher'))
+            if watcher.start():
+                self.watcher = watcher
+                # Folders are watched as they are scanned, starting with the next pass
+                self.log('Watching local sources for changes', xbmc.LOGINFO)
+            else:
+                self.log('File system watching is not available on this platform', xbmc.LOGWARNING)
+        elif not wanted and self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+            self.log('Stopped watching local sources', xbmc.LOGINFO)
+    
+    def on_folders_changed(self, changes: Dict[str, Optional[int]]):
+        """Called by the file system watcher with changed folders"""
+        with self.events_lock:
+            self.queued_folders.extend((path, PRIORITY_RECENT, depth) for path, depth in changes.items())
+    
+    def on_library_scan_started(self):
+        """Called when Kodi starts a library scan"""
+        with self.events_lock:
+            self.library_scanning = True
+    
+    def on_library_scan_finished(self):
+        """Called when Kodi finishes a library scan"""
+        with self.events_lock:
+            self.library_scanning = False
+            self.library_scan_finished = True
+    
+    def on_library_update(self, movie_id: int):
+        """Called when a movie was added or changed in the Kodi library"""
+        with self.events_lock:
+            self.updated_movies.add(movie_id)
+    
+    def on_library_remove(self, movie_id: int):
+        """Called when a movie was removed from the Kodi library"""
+        self.library.remove_id(movie_id)
+    
+    def get_movie_file(self, movie_id: int) -> Optional[str]:
+        """Get the file of a single movie from Kodi"""
+        request = json.dumps({
+            "jsonrpc": "2.0",
+            "method": "VideoLibrary.GetMovieDetails",
+            "params": {
+                "movieid": movie_id,
+                "properties": ["file", "dateadded", "genre"]
+            },
+            "id": 1
+        })
+        with self.metrics.jsonrpc(['VideoLibrary.GetMovieDetails']):
+            response = xbmc.executeJSONRPC(request)
+        result = json.loads(response)
+        details = result.get('result', {}).get('moviedetails')
+        if not details or not details.get('file'):
+            return None
+        
+        directory = LibrarySnapshot.movie_dir(details['file'])
+        self.library.set(directory, MovieEntry(
+            movie_id, details['file'],
+            LibrarySnapshot.parse_date(details.get('dateadded', '')),
+            details.get('genre', [])
+        ))
+        return directory
+    
+    def process_library_events(self):
+        """Queue folders affected by Kodi library notifications"""
+        with self.events_lock:
+            if self.library_scanning:
+                # Wait for OnScanFinished instead of handling every OnUpdate
+                return
+            scan_finished = self.library_scan_finished
+            updated = self.updated_movies
+            self.library_scan_finished = False
+            self.updated_movies = set()
+        
+        if not scan_finished and not updated:
+            return
+        
+        try:
+            if not self.library.loaded_at:
+                # Nothing to compare with yet, the first full pass covers everything
+                self.library.load()
+                return
+            
+            if scan_finished or len(updated) > self.MAX_SINGLE_UPDATES:
+                changed = self.library.reload_changes()
+                if changed is None:
+                    self.log('Could not load movies from Kodi library', xbmc.LOGERROR)
+                    return
+            else:
+                changed = []
+                for movie_id in updated:
+                    directory = self.get_movie_file(movie_id)
+                    if directory:
+                        changed.append(directory)
+            
+            if changed:
+                self.log(f'Library changed, queuing {len(changed)} folders', xbmc.LOGDEBUG)
+            for directory in changed:
+                self.queue_folder(directory, PRIORITY_RECENT, depth=0)
+        except Exception as e:
+            self.log(f'Error processing library events: {e}', xbmc.LOGERROR)
     
     def run_scanner(self):
         """Main scanner loop"""
@@ -451,16 +1044,30 @@ class NFOScanner:
         while self.running and not self.monitor.abortRequested():
             try:
                 current_time = time.time()
-                scan_interval_seconds = self.scan_interval * 60
+                if self.event_driven:
+                    # Events drive scanning, full passes only catch what they missed
+                    scan_interval_seconds = self.sweep_interval * 60 * 60
+                else:
+                    scan_interval_seconds = self.scan_interval * 60
                 
                 # Check if it's time to scan
                 if current_time - last_scan_time >= scan_interval_seconds:
                     if not self.paused:
                         self.scan_all_sources()
                         last_scan_time = current_time
+                elif not self.paused:
+                    self.resolve_queued_folders()
+                    if self.event_driven:
+                        self.process_library_events()
+                    if self.scheduler.pending():
+                        self.scan_priority_folders()
+                    elif self.writer.pending():
+                        # Scans held back by the rate limit
+                        self.writer.flush()
                 
-                # Wait a bit before checking again
-                if self.monitor.waitForAbort(10):
+                # Wait a bit before checking again, short enough to
+                # pick up folders the user navigates to within seconds
+                if self.monitor.waitForAbort(1):
                     break
                     
             except Exception as e:
@@ -1,14 +1,34 @@
 """Plugin Log Manager - Handles file-based logging for NFO Scanner"""
+import json
 import os
+import queue
+import re
+import threading
 import time
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 import xbmc
 import xbmcvfs
 
 
 class PluginLog:
-    """Manages plugin logging to a file"""
+    """Manages plugin logging to a file
+    
+    Messages are formatted by the calling thread and handed to a background
+    writer thread through a bounded queue. The writer appends them in
+    batches and keeps track of the file size itself, so logging never waits
+    for file system calls.
+    """
+    
+    # Maximum number of messages waiting to be written, newer ones are dropped
+    QUEUE_SIZE = 10000
+    
+    # Messages written at once, and maximum seconds a message waits in the queue
+    BATCH_SIZE = 500
+    FLUSH_INTERVAL = 1.0
+    
+    # Bytes read at once when reading the log from the end
+    BLOCK_SIZE = 64 * 1024
     
     # Log levels
     DEBUG = 0
@@ -22,20 +42,30 @@ class PluginLog:
         WARNING: 'WARNING',
         ERROR: 'ERROR'
     }
+    LEVELS_BY_NAME = {name: level for level, name in LEVEL_NAMES.items()}
     
-    def __init__(self, addon, max_size_mb: int = 2, max_lines: int = 1000):
+    # Component of messages that don't name one
+    DEFAULT_COMPONENT = 'scanner'
+    
+    # Text format line: [2024-01-31 12:00:00] [INFO] message
+    TEXT_LINE = re.compile(r'^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] \[([A-Z]+)\] (.*)$')
+    TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+    
+    def __init__(self, addon, max_size_mb: int = 2, max_lines: int = 1000, max_segments: int = 3):
         """
         Initialize the plugin logger
         
         Args:
             addon: The Kodi addon instance
             max_size_mb: Maximum log file size in MB before rotation
-            max_lines: Maximum number of lines to keep in log
+            max_lines: Number of lines returned by read_log by default
+            max_segments: Number of rotated segments kept besides the current log file
         """
         self.addon = addon
         self.addon_id = addon.getAddonInfo('id')
         self.max_size_bytes = max_size_mb * 1024 * 1024
         self.max_lines = max_lines
+        self.max_segments = max(1, max_segments)
         
         # Get addon data directory
         profile_path = xbmcvfs.translatePath(addon.getAddonInfo('profile'))
@@ -44,6 +74,14 @@ class PluginLog:
         
         self.log_file = os.path.join(profile_path, 'scanner.log')
         self.debug_enabled = False
+        self.structured = False  # Write JSON lines instead of text lines
+        
+        # Background writer, started by the first message
+        self.queue = queue.Queue(self.QUEUE_SIZE)
+        self.writer_lock = threading.Lock()
+        self.writer_thread = None
+        self.file_size = None  # Known size of the log file, None until checked
+        self.dropped = 0
         
         # Log to Kodi log that we're using file-based logging
         xbmc.log(f'[{self.addon_id}] Plugin log file: {self.log_file}', xbmc.LOGINFO)
@@ -52,136 +90,337 @@ class PluginLog:
         """Enable or disable debug logging"""
         self.debug_enabled = enabled
     
-    def _write_to_file(self, message: str):
-        """Write message to log file with rotation"""
+    def set_structured(self, enabled: bool):
+        """Enable or disable JSON-lines log records"""
+        self.structured = enabled
+    
+    def _format(self, message: str, level: int, component: Optional[str], path: Optional[str]) -> str:
+        """Format a log line in the configured format"""
+        now = time.time()
+        level_name = self.LEVEL_NAMES.get(level, 'INFO')
+        if self.structured:
+            record = {
+                'ts': round(now, 3),
+                'level': level_name,
+                'component': component or self.DEFAULT_COMPONENT,
+                'msg': message
+            }
+            if path:
+                record['path'] = path
+            return json.dumps(record, ensure_ascii=False)
+        
+        timestamp = datetime.fromtimestamp(now).strftime(self.TIME_FORMAT)
+        return f'[{timestamp}] [{level_name}] {message}'
+    
+    def _get_file_size(self) -> int:
+        """Get the current size of the log file from the file system"""
+        if xbmcvfs.exists(self.log_file):
+            return xbmcvfs.Stat(self.log_file).st_size()
+        return 0
+    
+    def _write_to_file(self, messages):
+        """Append messages to the log file with rotation"""
         try:
+            if self.file_size is None:
+                self.file_size = self._get_file_size()
+            
             # Check if rotation is needed
-            if xbmcvfs.exists(self.log_file):
-                stat = xbmcvfs.Stat(self.log_file)
-                if stat.st_size() > self.max_size_bytes:
-                    self._rotate_log()
+            if self.file_size > self.max_size_bytes:
+                self._rotate_log()
+                self.file_size = self._get_file_size()
             
             # Append to log file
+            data = '\n'.join(messages).encode('utf-8') + b'\n'
             file_obj = xbmcvfs.File(self.log_file, 'a')
-            file_obj.write(message.encode('utf-8') + b'\n')
+            file_obj.write(data)
             file_obj.close()
+            self.file_size += len(data)
             
         except Exception as e:
             # If file logging fails, at least log to Kodi log
+            self.file_size = None
             xbmc.log(f'[{self.addon_id}] Error writing to log file: {e}', xbmc.LOGERROR)
     
+    def _start_writer(self):
+        """Start the background writer thread if it isn't running"""
+        with self.writer_lock:
+            if self.writer_thread is None or not self.writer_thread.is_alive():
+                self.writer_thread = threading.Thread(target=self._writer, name='NFOScanLogWriter')
+                self.writer_thread.daemon = True
+                self.writer_thread.start()
+    
+    def _writer(self):
+        """Writer thread loop, exits on a None message"""
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            # Collect more messages until the batch is full or the oldest one waited long enough
+            while len(batch) < self.BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            messages = [message for message in batch if message is not None]
+            running = len(messages) == len(batch)
+            if self.dropped:
+                messages.append(self._format(f'{self.dropped} log messages dropped, log queue was full',
+                                             self.WARNING, None, None))
+                self.dropped = 0
+            if messages:
+                self._write_to_file(messages)
+            for _ in batch:
+                self.queue.task_done()
+    
+    def flush(self):
+        """Wait until all queued messages are written"""
+        if self.writer_thread is not None and self.writer_thread.is_alive():
+            self.queue.join()
+    
+    def close(self):
+        """Write all queued messages and stop the writer thread"""
+        with self.writer_lock:
+            thread = self.writer_thread
+            self.writer_thread = None
+        if thread is not None and thread.is_alive():
+            self.queue.put(None)
+            thread.join(timeout=5)
+    
+    def get_segment_path(self, index: int) -> str:
+        """Get the path of a log segment, 0 is the current log file"""
+        return f'{self.log_file}.{index}' if index else self.log_file
+    
+    def get_segments(self):
+        """Get paths of existing log segments, newest first"""
+        segments = []
+        for index in range(self.max_segments + 1):
+            path = self.get_segment_path(index)
+            if index and not xbmcvfs.exists(path):
+                break
+            segments.append(path)
+        return segments
+    
     def _rotate_log(self):
-        """Rotate log file by keeping only recent entries"""
+        """Rotate log segments: scanner.log becomes scanner.log.1 and so on
+        
+        Only renames files, the oldest segment is deleted.
+        """
         try:
-            # Read existing log
-            file_obj = xbmcvfs.File(self.log_file, 'r')
-            content = file_obj.read()
-            file_obj.close()
-            
-            # Decode and split into lines
-            lines = content.decode('utf-8', errors='ignore').split('\n')
-            
-            # Keep only last N lines
-            if len(lines) > self.max_lines:
-                lines = lines[-self.max_lines:]
-            
-            # Write back
-            file_obj = xbmcvfs.File(self.log_file, 'w')
-            file_obj.write('\n'.join(lines).encode('utf-8'))
-            file_obj.close()
+            oldest = self.get_segment_path(self.max_segments)
+            if xbmcvfs.exists(oldest):
+                xbmcvfs.delete(oldest)
+            for index in range(self.max_segments - 1, -1, -1):
+                path = self.get_segment_path(index)
+                if xbmcvfs.exists(path):
+                    xbmcvfs.rename(path, self.get_segment_path(index + 1))
             
             xbmc.log(f'[{self.addon_id}] Log file rotated', xbmc.LOGINFO)
             
         except Exception as e:
             xbmc.log(f'[{self.addon_id}] Error rotating log file: {e}', xbmc.LOGERROR)
     
-    def log(self, message: str, level: int = INFO):
+    def log(self, message: str, level: int = INFO, component: Optional[str] = None, path: Optional[str] = None):
         """
         Log a message
         
         Args:
             message: The message to log
             level: Log level (DEBUG, INFO, WARNING, ERROR)
+            component: Part of the addon the message comes from (structured format only)
+            path: Folder the message is about (structured format only)
         """
         # Skip debug messages if debug is not enabled
         if level == self.DEBUG and not self.debug_enabled:
             return
         
-        # Create timestamp
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        level_name = self.LEVEL_NAMES.get(level, 'INFO')
-        
         # Format message
-        log_message = f'[{timestamp}] [{level_name}] {message}'
+        log_message = self._format(message, level, component, path)
         
-        # Write to file
-        self._write_to_file(log_message)
+        # Queue for the writer thread
+        try:
+            self.queue.put_nowait(log_message)
+        except queue.Full:
+            self.dropped += 1
+        if self.writer_thread is None:
+            self._start_writer()
         
         # Also write to Kodi log for errors and warnings
         if level >= self.WARNING:
             kodi_level = xbmc.LOGERROR if level == self.ERROR else xbmc.LOGWARNING
             xbmc.log(f'[{self.addon_id}] {message}', kodi_level)
     
-    def debug(self, message: str):
+    def debug(self, message: str, **kwargs):
         """Log a debug message"""
-        self.log(message, self.DEBUG)
+        self.log(message, self.DEBUG, **kwargs)
     
-    def info(self, message: str):
+    def info(self, message: str, **kwargs):
         """Log an info message"""
-        self.log(message, self.INFO)
+        self.log(message, self.INFO, **kwargs)
     
-    def warning(self, message: str):
+    def warning(self, message: str, **kwargs):
         """Log a warning message"""
-        self.log(message, self.WARNING)
+        self.log(message, self.WARNING, **kwargs)
     
-    def error(self, message: str):
+    def error(self, message: str, **kwargs):
         """Log an error message"""
-        self.log(message, self.ERROR)
+        self.log(message, self.ERROR, **kwargs)
     
     def get_log_path(self) -> str:
         """Get the path to the log file"""
         return self.log_file
     
     def clear_log(self):
-        """Clear the log file"""
+        """Clear the log file and all rotated segments"""
         try:
-            if xbmcvfs.exists(self.log_file):
-                xbmcvfs.delete(self.log_file)
-                xbmc.log(f'[{self.addon_id}] Log file cleared', xbmc.LOGINFO)
+            self.flush()
+            for path in self.get_segments():
+                if xbmcvfs.exists(path):
+                    xbmcvfs.delete(path)
+            self.file_size = 0
+            xbmc.log(f'[{self.addon_id}] Log file cleared', xbmc.LOGINFO)
         except Exception as e:
             xbmc.log(f'[{self.addon_id}] Error clearing log file: {e}', xbmc.LOGERROR)
     
+    def _read_backwards(self, path: str):
+        """Yield lines of a file from the last to the first
+        
+        Reads fixed-size blocks from the end, so only one block and a
+        partial line are held in memory at a time.
+        """
+        file_obj = xbmcvfs.File(path, 'r')
+        try:
+            position = file_obj.size()
+            remainder = b''
+            while position > 0:
+                block_size = min(self.BLOCK_SIZE, position)
+                position -= block_size
+                file_obj.seek(position, 0)
+                block = bytes(file_obj.readBytes(block_size)) + remainder
+                lines = block.split(b'\n')
+                # The first piece may continue in the previous block
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    if line:
+                        yield line.decode('utf-8', errors='ignore')
+            if remainder:
+                yield remainder.decode('utf-8', errors='ignore')
+        finally:
+            file_obj.close()
+    
+    def iter_lines_reversed(self):
+        """Yield log lines over all segments, newest first"""
+        for path in self.get_segments():
+            if xbmcvfs.exists(path):
+                yield from self._read_backwards(path)
+    
     def read_log(self, max_lines: Optional[int] = None) -> str:
         """
-        Read the log file content
+        Read the end of the log
         
         Args:
-            max_lines: Maximum number of lines to return (from end)
+            max_lines: Maximum number of lines to return (from end),
+                defaults to the max_lines given to the constructor
         
         Returns:
             Log file content as string
         """
         try:
+            self.flush()
             if not xbmcvfs.exists(self.log_file):
                 return 'No log file exists yet.'
             
-            file_obj = xbmcvfs.File(self.log_file, 'r')
-            content = file_obj.read()
-            file_obj.close()
-            
-            # Decode content
-            text = content.decode('utf-8', errors='ignore')
+            limit = max_lines or self.max_lines
+            lines = []
+            for line in self.iter_lines_reversed():
+                lines.append(line)
+                if len(lines) >= limit:
+                    break
+            lines.reverse()
             
-            # Limit lines if requested
-            if max_lines:
-                lines = text.split('\n')
-                if len(lines) > max_lines:
-                    lines = lines[-max_lines:]
-                text = '\n'.join(lines)
-            
-            return text
+            return '\n'.join(lines)
             
         except Exception as e:
             error_msg = f'Error reading log file: {e}'
             xbmc.log(f'[{self.addon_id}] {error_msg}', xbmc.LOGERROR)
             return error_msg
+    
+    @classmethod
+    def parse_record(cls, line: str) -> Dict:
+        """Parse a log line of either format into a record
+        
+        Lines that match neither format (e.g. continued multi-line
+        messages) become INFO records without a timestamp.
+        """
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+                record.setdefault('path', '')
+                return record
+            except ValueError:
+                pass
+        
+        match = cls.TEXT_LINE.match(line)
+        if match:
+            try:
+                ts = datetime.strptime(match.group(1), cls.TIME_FORMAT).timestamp()
+            except ValueError:
+                ts = 0
+            return {'ts': ts, 'level': match.group(2), 'component': '', 'path': '', 'msg': match.group(3)}
+        return {'ts': 0, 'level': 'INFO', 'component': '', 'path': '', 'msg': line}
+    
+    @classmethod
+    def format_record(cls, record: Dict) -> str:
+        """Format a parsed record as a text log line"""
+        timestamp = datetime.fromtimestamp(record['ts']).strftime(cls.TIME_FORMAT) if record['ts'] else ''
+        component = f' [{record["component"]}]' if record.get('component') else ''
+        return f'[{timestamp}] [{record["level"]}]{component} {record["msg"]}'
+    
+    def query(self, min_level: int = DEBUG, path_prefix: str = '', since: float = 0,
+              offset: int = 0, limit: int = 200) -> Tuple[List[Dict], bool]:
+        """
+        Find log records, newest first
+        
+        Streams over the log segments from the end, so only the requested
+        page is kept in memory. Records without a path (text format) match
+        a path prefix that appears in their message.
+        
+        Args:
+            min_level: Lowest level to include
+            path_prefix: Only records about folders below this path
+            since: Only records written after this timestamp, 0 for all
+            offset: Number of matching records to skip
+            limit: Maximum number of records to return
+        
+        Returns:
+            Tuple of (records, True if more records match)
+        """
+        self.flush()
+        records = []
+        skipped = 0
+        try:
+            for line in self.iter_lines_reversed():
+                record = self.parse_record(line)
+                if since and record['ts'] and record['ts'] < since:
+                    # Everything further back is older
+                    break
+                if self.LEVELS_BY_NAME.get(record['level'], self.INFO) < min_level:
+                    continue
+                if path_prefix:
+                    if record['path']:
+                        if not record['path'].startswith(path_prefix):
+                            continue
+                    elif path_prefix not in record['msg']:
+                        continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                if len(records) >= limit:
+                    return records, True
+                records.append(record)
+        except Exception as e:
+            xbmc.log(f'[{self.addon_id}] Error reading log file: {e}', xbmc.LOGERROR)
+        return records, False
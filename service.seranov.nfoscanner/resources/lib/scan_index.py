@@ -0,0 +1,218 @@
+"""Scan Index - Persistent per-folder scan state stored in SQLite"""
+import os
+import sqlite3
+import threading
+from typing import FrozenSet, List, Optional
+import xbmc
+import xbmcvfs
+
+
+class FolderEntry:
+    """Scan state of a single folder"""
+    __slots__ = ('mtime', 'movie_nfo_mtime', 'category_nfo_mtime', 'own_genres', 'genres', 'subdirs',
+                 'pass_id', 'movie_nfo_hash', 'category_nfo_hash')
+    
+    def __init__(self, mtime: float, movie_nfo_mtime: float, category_nfo_mtime: float,
+                 own_genres: FrozenSet[str], genres: FrozenSet[str], subdirs: List[str],
+                 pass_id: int = 0, movie_nfo_hash: str = '', category_nfo_hash: str = ''):
+        self.mtime = mtime
+        self.movie_nfo_mtime = movie_nfo_mtime
+        self.category_nfo_mtime = category_nfo_mtime
+        self.own_genres = own_genres  # Genres from this folder's category.nfo
+        self.genres = genres  # Resolved genres including inherited ones
+        self.subdirs = subdirs
+        self.pass_id = pass_id  # Scan pass that wrote this entry, 0 for partial scans
+        self.movie_nfo_hash = movie_nfo_hash  # Content hashes, empty if not known
+        self.category_nfo_hash = category_nfo_hash
+
+
+class ScanIndex:
+    """Persistent index of scanned folders in the addon profile directory
+    
+    Keeps folder and NFO modification times and NFO content hashes together
+    with resolved genres, so later passes (and passes after a restart) can
+    skip unchanged folders.
+    Every full pass gets an increasing ID; an entry written by a pass that
+    ran to completion guarantees that its whole subtree was scanned too.
+    """
+    
+    # Number of pending writes after which changes are committed
+    COMMIT_EVERY = 500
+    
+    SEPARATOR = '\n'
+    
+    def __init__(self, addon):
+        profile_path = xbmcvfs.translatePath(addon.getAddonInfo('profile'))
+        if not xbmcvfs.exists(profile_path):
+            xbmcvfs.mkdirs(profile_path)
+        
+        self.addon_id = addon.getAddonInfo('id')
+        self.db_file = os.path.join(profile_path, 'scan_index.db')
+        self.lock = threading.Lock()
+        self.pending_writes = 0
+        self.completed_pass = 0
+        self.connection = None
+    
+    def open(self):
+        """Open the index database, creating it if needed"""
+        with self.lock:
+            if self.connection:
+                return
+            # Shared between scan worker threads, access is serialized by self.lock
+            self.connection = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS folders (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    movie_nfo_mtime REAL NOT NULL DEFAULT 0,
+                    category_nfo_mtime REAL NOT NULL DEFAULT 0,
+                    own_genres TEXT NOT NULL DEFAULT '',
+                    genres TEXT NOT NULL DEFAULT '',
+                    subdirs TEXT NOT NULL DEFAULT '',
+                    pass_id INTEGER NOT NULL DEFAULT 0,
+                    movie_nfo_hash TEXT NOT NULL DEFAULT '',
+                    category_nfo_hash TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            # Indexes created by older versions lack the hash columns
+            columns = {row[1] for row in self.connection.execute('PRAGMA table_info(folders)')}
+            for column in ('movie_nfo_hash', 'category_nfo_hash'):
+                if column not in columns:
+                    self.connection.execute(
+                        f"ALTER TABLE folders ADD COLUMN {column} TEXT NOT NULL DEFAULT ''"
+                    )
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)'
+            )
+            self.connection.commit()
+    
+    def close(self):
+        """Commit pending changes and close the database"""
+        with self.lock:
+            if self.connection:
+                self.connection.commit()
+                self.connection.close()
+                self.connection = None
+                self.pending_writes = 0
+    
+    def _get_meta(self, key: str) -> int:
+        """Read an integer value from the meta table (caller holds the lock)"""
+        row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else 0
+    
+    def _set_meta(self, key: str, value: int):
+        """Write an integer value to the meta table (caller holds the lock)"""
+        self.connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+    
+    def begin_pass(self) -> int:
+        """Start a new full scan pass
+        
+        Returns:
+            ID of the new pass
+        """
+        with self.lock:
+            if not self.connection:
+                return 0
+            pass_id = self._get_meta('last_pass') + 1
+            self._set_meta('last_pass', pass_id)
+            self.connection.commit()
+            self.completed_pass = self._get_meta('completed_pass')
+            return pass_id
+    
+    def finish_pass(self, pass_id: int):
+        """Mark a full scan pass as completed"""
+        with self.lock:
+            if not self.connection or not pass_id:
+                return
+            self._set_meta('completed_pass', pass_id)
+            self.connection.commit()
+            self.completed_pass = pass_id
+            self.pending_writes = 0
+    
+    def is_complete(self, entry: FolderEntry) -> bool:
+        """Check if an entry was written by a pass that scanned its whole subtree"""
+        return 0 < entry.pass_id <= self.completed_pass
+    
+    def _split(self, value: str) -> List[str]:
+        """Split a stored list value"""
+        return value.split(self.SEPARATOR) if value else []
+    
+    def get(self, path: str) -> Optional[FolderEntry]:
+        """Get stored scan state of a folder"""
+        with self.lock:
+            if not self.connection:
+                return None
+            row = self.connection.execute(
+                'SELECT mtime, movie_nfo_mtime, category_nfo_mtime, own_genres, genres, subdirs, pass_id, '
+                'movie_nfo_hash, category_nfo_hash FROM folders WHERE path = ?', (path,)
+            ).fetchone()
+        
+        if row is None:
+            return None
+        return FolderEntry(
+            row[0], row[1], row[2],
+            frozenset(self._split(row[3])),
+            frozenset(self._split(row[4])),
+            self._split(row[5]),
+            row[6], row[7], row[8]
+        )
+    
+    def put(self, path: str, entry: FolderEntry):
+        """Store scan state of a folder"""
+        with self.lock:
+            if not self.connection:
+                return
+            self.connection.execute(
+                'INSERT OR REPLACE INTO folders '
+                '(path, mtime, movie_nfo_mtime, category_nfo_mtime, own_genres, genres, subdirs, pass_id, '
+                'movie_nfo_hash, category_nfo_hash) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    path, entry.mtime, entry.movie_nfo_mtime, entry.category_nfo_mtime,
+                    self.SEPARATOR.join(sorted(entry.own_genres)),
+                    self.SEPARATOR.join(sorted(entry.genres)),
+                    self.SEPARATOR.join(entry.subdirs),
+                    entry.pass_id, entry.movie_nfo_hash, entry.category_nfo_hash
+                )
+            )
+            self.pending_writes += 1
+            if self.pending_writes >= self.COMMIT_EVERY:
+                self.connection.commit()
+                self.pending_writes = 0
+    
+    def remove_tree(self, path: str):
+        """Remove a folder and all folders below it"""
+        prefix = path.rstrip('/\\') + os.sep
+        with self.lock:
+            if not self.connection:
+                return
+            self.connection.execute(
+                'DELETE FROM folders WHERE path = ? OR substr(path, 1, ?) = ?',
+                (path, len(prefix), prefix)
+            )
+            self.pending_writes += 1
+    
+    def commit(self):
+        """Commit pending changes"""
+        with self.lock:
+            if self.connection and self.pending_writes:
+                self.connection.commit()
+                self.pending_writes = 0
+    
+    def clear(self):
+        """Remove all stored folder state"""
+        with self.lock:
+            if self.connection:
+                self.connection.execute('DELETE FROM folders')
+                self.connection.execute('DELETE FROM meta')
+                self.completed_pass = 0
+                self.connection.commit()
+                self.pending_writes = 0
+                return
+        try:
+            if xbmcvfs.exists(self.db_file):
+                xbmcvfs.delete(self.db_file)
+        except Exception as e:
+            xbmc.log(f'[{self.addon_id}] Error deleting scan index: {e}', xbmc.LOGERROR)
@@ -0,0 +1,209 @@
+"""Scan Metrics - Counters and latency histograms of scanner operations"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+import xbmc
+import xbmcvfs
+
+
+class ScanMetrics:
+    """Collects scanner statistics and stores them as JSON in the profile directory
+    
+    Counters and per-operation latency histograms accumulate from service
+    start. Each kind of pass (full walk or priority scan) also keeps a
+    summary of its most recent run.
+    """
+    
+    # Upper bounds of latency histogram buckets in milliseconds, the last bucket is unbounded
+    BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+    
+    # Minimum seconds between stats file writes after priority passes
+    SAVE_INTERVAL = 60
+    
+    # Counters shown in the report, in this order
+    COUNTERS = (
+        ('folders_visited', 'Folders visited'),
+        ('folders_skipped', 'Unchanged branches skipped'),
+        ('nfo_hashed', 'NFO files hashed'),
+        ('nfo_parsed', 'category.nfo files parsed'),
+        ('bytes_read', 'Bytes read'),
+        ('movies_reimported', 'Movies re-imported'),
+        ('genre_updates', 'Genre updates'),
+    )
+    
+    def __init__(self, addon):
+        profile_path = xbmcvfs.translatePath(addon.getAddonInfo('profile'))
+        if not xbmcvfs.exists(profile_path):
+            xbmcvfs.mkdirs(profile_path)
+        
+        self.addon_id = addon.getAddonInfo('id')
+        self.stats_file = os.path.join(profile_path, 'scan_stats.json')
+        self.lock = threading.Lock()
+        self.last_save = 0
+        self.reset()
+    
+    def reset(self):
+        """Drop all collected statistics"""
+        with self.lock:
+            self.started = time.time()
+            self.counters: Dict[str, int] = {}
+            self.rpc_calls: Dict[str, int] = {}
+            self.timings: Dict[str, dict] = {}
+            self.passes: Dict[str, dict] = {}
+            self.current: Dict[str, dict] = {}  # pass kind -> counters at pass start
+    
+    def count(self, name: str, amount: int = 1):
+        """Increase a counter"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def record(self, operation: str, seconds: float):
+        """Add a latency sample of an operation"""
+        ms = seconds * 1000
+        with self.lock:
+            timing = self.timings.get(operation)
+            if timing is None:
+                timing = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                          'buckets': [0] * (len(self.BUCKETS_MS) + 1)}
+                self.timings[operation] = timing
+            timing['count'] += 1
+            timing['total_ms'] += ms
+            timing['max_ms'] = max(timing['max_ms'], ms)
+            for index, bound in enumerate(self.BUCKETS_MS):
+                if ms <= bound:
+                    break
+            else:
+                index = len(self.BUCKETS_MS)
+            timing['buckets'][index] += 1
+    
+    @contextmanager
+    def timed(self, operation: str):
+        """Measure the latency of the wrapped block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(operation, time.perf_counter() - start)
+    
+    @contextmanager
+    def jsonrpc(self, methods: List[str]):
+        """Count the JSON-RPC calls of a request and measure its latency
+        
+        Single calls are timed per method, batch requests as a whole.
+        """
+        with self.lock:
+            for method in methods:
+                self.rpc_calls[method] = self.rpc_calls.get(method, 0) + 1
+        with self.timed(f'jsonrpc.{methods[0]}' if len(methods) == 1 else 'jsonrpc.batch'):
+            yield
+    
+    def start_pass(self, kind: str):
+        """Mark the start of a scan pass"""
+        with self.lock:
+            self.current[kind] = {'started': time.time(), 'counters': dict(self.counters)}
+    
+    def finish_pass(self, kind: str, interrupted: bool = False):
+        """Mark the end of a scan pass and remember its summary"""
+        with self.lock:
+            current = self.current.pop(kind, None)
+            if current is None:
+                return
+            before = current['counters']
+            duration = time.time() - current['started']
+            self.passes[kind] = {
+                'started': current['started'],
+                'duration': duration,
+                'interrupted': interrupted,
+                'counters': {
+                    name: value - before.get(name, 0)
+                    for name, value in self.counters.items()
+                    if value != before.get(name, 0)
+                },
+            }
+        self.record(f'pass.{kind}', duration)
+    
+    def to_dict(self) -> dict:
+        """Get all statistics as a JSON-serializable dictionary"""
+        with self.lock:
+            return {
+                'started': self.started,
+                'saved': time.time(),
+                'counters': dict(self.counters),
+                'rpc_calls': dict(self.rpc_calls),
+                'timings': {name: dict(timing, buckets=list(timing['buckets']))
+                            for name, timing in self.timings.items()},
+                'buckets_ms': list(self.BUCKETS_MS),
+                'passes': {kind: dict(summary) for kind, summary in self.passes.items()},
+            }
+    
+    def save(self, force: bool = True):
+        """Write statistics to the stats file
+        
+        Args:
+            force: Write even if the file was written less than SAVE_INTERVAL seconds ago
+        """
+        if not force and time.time() - self.last_save < self.SAVE_INTERVAL:
+            return
+        self.last_save = time.time()
+        try:
+            file_obj = xbmcvfs.File(self.stats_file, 'w')
+            file_obj.write(json.dumps(self.to_dict(), indent=1).encode('utf-8'))
+            file_obj.close()
+        except Exception as e:
+            xbmc.log(f'[{self.addon_id}] Error writing stats file: {e}', xbmc.LOGERROR)
+    
+    @staticmethod
+    def load(stats_file: str) -> Optional[dict]:
+        """Read a stats file written by save()"""
+        if not xbmcvfs.exists(stats_file):
+            return None
+        file_obj = xbmcvfs.File(stats_file, 'r')
+        content = file_obj.readBytes()
+        file_obj.close()
+        return json.loads(bytes(content).decode('utf-8'))
+    
+    @classmethod
+    def format_report(cls, stats: dict) -> str:
+        """Format statistics loaded from the stats file as readable text"""
+        def format_time(timestamp):
+            return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+        
+        lines = [
+            f'Collected since: {format_time(stats["started"])}',
+            f'Last update: {format_time(stats["saved"])}',
+            '',
+        ]
+        
+        for kind, summary in sorted(stats.get('passes', {}).items()):
+            status = ' (interrupted)' if summary.get('interrupted') else ''
+            lines.append(f'Last {kind} pass: {format_time(summary["started"])}, '
+                         f'{summary["duration"]:.1f} s{status}')
+            for name, value in sorted(summary.get('counters', {}).items()):
+                lines.append(f'    {name}: {value}')
+        
+        lines += ['', 'Counters:']
+        counters = stats.get('counters', {})
+        for name, label in cls.COUNTERS:
+            lines.append(f'    {label}: {counters.get(name, 0)}')
+        
+        lines += ['', 'JSON-RPC calls:']
+        for method, calls in sorted(stats.get('rpc_calls', {}).items()):
+            lines.append(f'    {method}: {calls}')
+        
+        bounds = stats.get('buckets_ms', list(cls.BUCKETS_MS))
+        labels = [f'<={bound}ms' for bound in bounds] + [f'>{bounds[-1]}ms']
+        lines += ['', 'Latency (count, avg, max, histogram):']
+        for name, timing in sorted(stats.get('timings', {}).items()):
+            average = timing['total_ms'] / timing['count'] if timing['count'] else 0
+            histogram = ' '.join(
+                f'{label}:{value}' for label, value in zip(labels, timing['buckets']) if value
+            )
+            lines.append(f'    {name}: {timing["count"]}, {average:.1f} ms, '
+                         f'{timing["max_ms"]:.1f} ms')
+            lines.append(f'        {histogram}')
+        
+        return '\n'.join(lines)
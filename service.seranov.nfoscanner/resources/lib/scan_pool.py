@@ -0,0 +1,95 @@
+"""Scan Worker Pool - Bounded pool of threads fed by the shared scan scheduler"""
+import threading
+from typing import Callable, Iterable, List, Tuple
+
+from .scan_scheduler import ScanScheduler, ScanTask
+
+
+class ScanWorkerPool:
+    """Runs folder scan tasks on a fixed number of worker threads
+    
+    Workers take tasks from a shared ScanScheduler and hand them to
+    ``handler``, which returns a tuple of ``(count, children)``: the number
+    of items processed in that folder and a list of new tasks (subfolders)
+    to put back into the scheduler. The pool finishes when the scheduler is
+    drained, or when ``should_stop`` reports that the scanner is stopping.
+    Tasks queued by other threads while the pool runs are picked up too.
+    """
+    
+    # How long an idle worker waits for new work before re-checking state
+    POLL_TIMEOUT = 0.5
+    
+    def __init__(self,
+                 handler: Callable[[ScanTask], Tuple[int, List[ScanTask]]],
+                 scheduler: ScanScheduler,
+                 thread_count: int,
+                 should_stop: Callable[[], bool],
+                 wait_if_paused: Callable[[], bool],
+                 log: Callable[[str], None] = None):
+        """
+        Initialize the worker pool
+        
+        Args:
+            handler: Callable processing one task
+            scheduler: Shared task queue
+            thread_count: Number of worker threads
+            should_stop: Returns True when workers must exit
+            wait_if_paused: Blocks while paused, returns False on abort
+            log: Optional callable for error messages
+        """
+        self.handler = handler
+        self.scheduler = scheduler
+        self.thread_count = max(1, int(thread_count))
+        self.should_stop = should_stop
+        self.wait_if_paused = wait_if_paused
+        self.log = log
+        
+        self.lock = threading.Lock()
+        self.total = 0
+    
+    def run(self, seeds: Iterable[ScanTask] = ()) -> int:
+        """Process seed tasks, already queued tasks and everything they produce
+        
+        Returns:
+            Sum of counts returned by the handler
+        """
+        for task in seeds:
+            self.scheduler.put(task)
+        
+        workers = []
+        for index in range(self.thread_count):
+            worker = threading.Thread(target=self._worker, name=f'NFOScanWorker-{index}')
+            worker.daemon = True
+            workers.append(worker)
+            worker.start()
+        
+        for worker in workers:
+            worker.join()
+        
+        return self.total
+    
+    def _worker(self):
+        """Worker thread loop"""
+        while not self.should_stop():
+            if not self.wait_if_paused():
+                break
+            
+            task = self.scheduler.get(self.POLL_TIMEOUT)
+            if task is None:
+                if self.scheduler.is_drained():
+                    break
+                continue
+            
+            try:
+                count, children = self.handler(task)
+                # Children must be queued before this task is marked done,
+                # otherwise other workers may see an empty scheduler and exit
+                for child in children:
+                    self.scheduler.put(child)
+                with self.lock:
+                    self.total += count
+            except Exception as e:
+                if self.log:
+                    self.log(f'Error in scan worker: {e}')
+            finally:
+                self.scheduler.task_done()
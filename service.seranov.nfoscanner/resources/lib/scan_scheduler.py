@@ -0,0 +1,138 @@
+"""Scan Scheduler - Priority queue of folder scan tasks"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, FrozenSet, Optional
+
+# Task priorities, lower value is scanned first
+PRIORITY_BROWSING = 0  # Folder the user is looking at
+PRIORITY_RECENT = 1  # Recently modified folder
+PRIORITY_BACKGROUND = 2  # Regular full walk
+
+
+class ScanTask:
+    """A folder waiting to be scanned"""
+    __slots__ = ('node', 'key', 'parent_genres', 'priority', 'depth', 'level')
+    
+    def __init__(self, node, parent_genres: FrozenSet[str] = frozenset(),
+                 priority: int = PRIORITY_BACKGROUND, depth: Optional[int] = None,
+                 level: int = 0):
+        """
+        Args:
+            node: FolderNode of the folder
+            parent_genres: Genres inherited from parent folders
+            priority: One of the PRIORITY_* constants
+            depth: How many subfolder levels to scan, None for the whole subtree
+            level: Distance of the folder from its source root
+        """
+        self.node = node
+        self.key = node.path  # Deduplication key
+        self.parent_genres = parent_genres
+        self.priority = priority
+        self.depth = depth
+        self.level = level
+    
+    def merge(self, other: 'ScanTask'):
+        """Merge another task for the same folder into this one
+        
+        The merged task keeps the higher priority and the deeper scan scope.
+        """
+        self.priority = min(self.priority, other.priority)
+        if self.depth is None or other.depth is None:
+            self.depth = None
+        else:
+            self.depth = max(self.depth, other.depth)
+        self.parent_genres = self.parent_genres | other.parent_genres
+
+
+class ScanScheduler:
+    """Thread-safe heap of scan tasks with deduplication
+    
+    A folder is queued at most once. Queuing it again with a higher
+    priority pushes a new heap entry and leaves the old one behind as
+    stale, so raising a priority costs O(log n) and never needs a heap
+    rebuild. The scheduler also counts tasks being processed, so workers
+    can tell when all queued work is done.
+    
+    Within a priority, tasks are taken in queue order (breadth-first). In
+    depth-first mode deeper folders go first, which finishes subtrees
+    sooner and keeps the number of queued folders small.
+    """
+    
+    def __init__(self):
+        self.heap = []
+        self.queued: Dict[str, ScanTask] = {}
+        self.counter = itertools.count()
+        self.in_progress = 0
+        self.depth_first = False
+        self.cond = threading.Condition()
+    
+    def _push(self, task: ScanTask):
+        """Push a heap entry for a task (caller holds the lock)"""
+        order = -task.level if self.depth_first else 0
+        heapq.heappush(self.heap, (task.priority, order, next(self.counter), task))
+    
+    def put(self, task: ScanTask):
+        """Queue a task or merge it into the queued task for the same folder"""
+        with self.cond:
+            existing = self.queued.get(task.key)
+            if existing is not None:
+                old_priority = existing.priority
+                existing.merge(task)
+                if existing.priority < old_priority:
+                    self._push(existing)
+                    self.cond.notify()
+                return
+            
+            self.queued[task.key] = task
+            self._push(task)
+            self.cond.notify()
+    
+    def _pop(self) -> Optional[ScanTask]:
+        """Pop the best live task (caller holds the lock)"""
+        while self.heap:
+            priority, _, _, task = heapq.heappop(self.heap)
+            # Skip entries left behind by priority changes or finished tasks
+            if self.queued.get(task.key) is task and task.priority == priority:
+                del self.queued[task.key]
+                self.in_progress += 1
+                return task
+        return None
+    
+    def get(self, timeout: float) -> Optional[ScanTask]:
+        """Take the highest priority task, waiting up to timeout seconds
+        
+        Every task returned must be confirmed with task_done().
+        """
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                task = self._pop()
+                if task is not None:
+                    return task
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+    
+    def task_done(self):
+        """Mark a task returned by get() as processed"""
+        with self.cond:
+            self.in_progress -= 1
+    
+    def pending(self) -> int:
+        """Get number of queued tasks"""
+        with self.cond:
+            return len(self.queued)
+    
+    def is_drained(self) -> bool:
+        """Check if nothing is queued or being processed"""
+        with self.cond:
+            return not self.queued and self.in_progress == 0
+    
+    def clear(self):
+        """Drop all queued tasks"""
+        with self.cond:
+            self.heap.clear()
+            self.queued.clear()
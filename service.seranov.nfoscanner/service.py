@@ -19,6 +19,16 @@ def log(msg):
     xbmc.log(f'[{addon_id}] {msg}', xbmc.LOGINFO)
 
 
+def get_library_item(data: str) -> dict:
+    """Get the item of a VideoLibrary.OnUpdate/OnRemove notification
+    
+    OnUpdate wraps it as {"item": {"id": .., "type": ..}, ...}, OnRemove
+    sends {"id": .., "type": ..} without the wrapper.
+    """
+    payload = json.loads(data)
+    return payload.get('item', payload)
+
+
 class ServiceMonitor(xbmc.Monitor):
     """Custom monitor class to handle Kodi events"""
     
@@ -43,6 +53,21 @@ class ServiceMonitor(xbmc.Monitor):
         elif method == 'GUI.OnScreensaverActivated':
             # Could use this to trigger scanning during idle time
             pass
+        elif method == 'VideoLibrary.OnScanStarted':
+            self.service.on_library_scan_started()
+        elif method == 'VideoLibrary.OnScanFinished':
+            self.service.on_library_scan_finished()
+        elif method in ('VideoLibrary.OnUpdate', 'VideoLibrary.OnRemove'):
+            # Only movies are of interest, other media types are ignored
+            try:
+                item = get_library_item(data)
+                if item.get('type') == 'movie' and item.get('id'):
+                    if method == 'VideoLibrary.OnUpdate':
+                        self.service.on_library_update(item['id'])
+                    else:
+                        self.service.on_library_remove(item['id'])
+            except Exception:
+                pass
         elif method == 'Other.FolderChanged':
             # Track folder navigation for priority scanning
             try:
@@ -149,6 +174,27 @@ class NFOScannerService:
             log('Playback stopped, resuming scanner')
             self.scanner.resume()
     
+    def on_library_scan_started(self):
+        """Called when Kodi starts a library scan"""
+        if self.scanner and self.scanner.event_driven:
+            self.scanner.on_library_scan_started()
+    
+    def on_library_scan_finished(self):
+        """Called when Kodi finishes a library scan"""
+        if self.scanner and self.scanner.event_driven:
+            log('Library scan finished, checking changed movies')
+            self.scanner.on_library_scan_finished()
+    
+    def on_library_update(self, movie_id: int):
+        """Called when a movie is added or updated in the library"""
+        if self.scanner and self.scanner.event_driven:
+            self.scanner.on_library_update(movie_id)
+    
+    def on_library_remove(self, movie_id: int):
+        """Called when a movie is removed from the library"""
+        if self.scanner:
+            self.scanner.on_library_remove(movie_id)
+    
     def on_folder_navigation(self, folder_path: str):
         """Called when user navigates to a folder"""
         if self.scanner: